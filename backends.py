@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# Registry of curve backends. A backend is a module providing the secp256k1
+# group with one interface:
+#
+#   curve, Point, Ideal       P + Q, -P, k*P, P == Q, hash(P), P.x, P.y
+#   multiScalarMultiply       k1*P1 + k2*P2 + ...
+#   encode, decode            33 byte SEC1 compressed points, b'\x00' for the ideal
+#   FixedBaseTable, batchInverse, batchAdd, batchNormalize
+#
+# curveParams builds G, I and order on the selected backend, and every other
+# module takes them from curveParams. The backend is chosen with the
+# ZORRO_CURVE environment variable or with select(), which has to be called
+# before curveParams is imported.
+
+import importlib
+import os
+import sys
+
+_modules = {}
+_selected = None
+
+DEFAULT = 'fast'
+
+def register(name : 'str', module : 'str'):
+    """
+    Make the backend implemented by module (a module name) available as name
+    """
+    _modules[name] = module
+
+register('reference', 'secp256k1_reference') # the generic library, pure Python
+register('fast', 'secp256k1') # specialized to secp256k1, pure Python
+register('openssl', 'secp256k1_openssl') # libcrypto through ctypes
+
+def names() -> '[str]':
+    return sorted(_modules)
+
+def available() -> '[str]':
+    """
+    The backends that can be loaded on this host
+    """
+    usable = []
+    for name in names():
+        try:
+            load(name)
+            usable.append(name)
+        except ImportError:
+            pass
+    return usable
+
+def select(name : 'str'):
+    """
+    Use the backend name instead of the one given by ZORRO_CURVE
+    """
+    global _selected
+    if name not in _modules:
+        raise ValueError('Unknown curve backend {}, expected one of {}'.format(name, names()))
+    if 'curveParams' in sys.modules and name != selected():
+        raise RuntimeError('The curve backend must be selected before curveParams is imported')
+    _selected = name
+
+def selected() -> 'str':
+    if _selected is not None:
+        return _selected
+    return os.environ.get('ZORRO_CURVE', DEFAULT)
+
+def load(name : 'str' = None):
+    """
+    The module of the backend name, by default the selected one. Raises
+    ImportError if it is not available on this host
+    """
+    if name is None:
+        name = selected()
+    if name not in _modules:
+        raise ValueError('Unknown curve backend {}, expected one of {}'.format(name, names()))
+    return importlib.import_module(_modules[name])
@@ -1,10 +1,18 @@
 #!/usr/bin/env python
 # This file defines the curve parameters for Elliptic Curve Cryptography
 
+import os
 import sys
 sys.path += ['elliptic-curves-finite-fields']
 from finitefield.finitefield import FiniteField
-from elliptic import GeneralizedEllipticCurve, Point, Ideal
+import backends
+
+# The curve arithmetic comes from the backend selected in backends.py
+# (ZORRO_CURVE or backends.select)
+backend = backends.load()
+(Point, Ideal, FixedBaseTable, multiScalarMultiply, batchInverse, batchAdd, batchNormalize, encode, decode) = (
+    backend.Point, backend.Ideal, backend.FixedBaseTable, backend.multiScalarMultiply,
+    backend.batchInverse, backend.batchAdd, backend.batchNormalize, backend.encode, backend.decode)
 
 ## 
 ## This is the definition of secp256k1, Bitcoin's elliptic curve.
@@ -15,7 +23,7 @@ q = 2**256 - 2**32 - 2**9 - 2**8 - 2**7 - 2**6 - 2**4 - 1
 Fq = FiniteField(q,1) # elliptic curve over F_q
 
 # Then the curve, always of the form y^2 = x^3 + {a6}
-curve = GeneralizedEllipticCurve(a6=Fq(7)) # E: y2 = x3+7
+curve = backend.curve # E: y2 = x3+7
 
 # base point, a generator of the group
 Gx = Fq(0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798)
@@ -26,3 +34,16 @@ I = Ideal(curve)
 # This is the order (# of elements in) the curve
 p = order = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
 Fp = FiniteField(p,1)
+
+# r*G is by far the most frequent multiplication, so it is served from a table
+# of precomputed multiples of G, built on first use. Set ZORRO_G_TABLE to a
+# file path to keep the table on disk across runs.
+G.fixedBase = FixedBaseTable(G, order, path=os.environ.get('ZORRO_G_TABLE'))
+
+def multi_scalar_mul(pairs : '[(int, Point)]') -> 'Point':
+    """
+    Compute k1*P1 + k2*P2 + ... for pairs [(k1, P1), (k2, P2), ...] at
+    roughly the cost of a single scalar multiplication for small n, and
+    sub-linearly in n for large sums. Scalars may be negative or unreduced
+    """
+    return multiScalarMultiply([(k % order, P) for (k, P) in pairs], curve)
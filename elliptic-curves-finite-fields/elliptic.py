@@ -1,3 +1,5 @@
+import os
+import json
 
 # An elliptic curve with generalized Weierstrass normal form
 class GeneralizedEllipticCurve(object):
@@ -20,6 +22,12 @@ class GeneralizedEllipticCurve(object):
         self.disc = -b2*b2*b8 - 8*b4*b4*b4 - 27*b6*b6 + 9*b2*b4*b6
         self.j = c4*c4*c4/self.disc
 
+        # y^2 = x^3 + a4x + a6, the only form the Jacobian formulas below support
+        self.isShortWeierstrass = (a1 == 0 and a2 == 0 and a3 == 0)
+
+        # number of points on the curve, if known; scalars are reduced modulo it
+        self.order = None
+
 
     def testPoint(self, x, y):
         return y*y + self.a1*x*y + self.a3*y - x*x*x - self.a2*(x*x) - self.a4*x - self.a6 == 0
@@ -27,6 +35,15 @@ class GeneralizedEllipticCurve(object):
 
 
 class Point(object):
+   # a FixedBaseTable of precomputed multiples, set on points like a generator
+   fixedBase = None
+
+   # window width of the NAF used by __mul__, and the cached table of odd
+   # multiples it needs, kept on the point so reused points (public keys)
+   # only build it once
+   wnafWidth = 5
+   oddMultiples = None
+
    def __init__ (self, curve, x, y):
         self.curve = curve # the curve containing this point
         self.x = x
@@ -56,13 +73,13 @@ class Point(object):
             return Ideal(self.curve)
          else:
             c = ((3*x*x + 2*a2*x + a4 - a1*self.y) / (2*self.y + a1*x + a3))
-            d = (-(x*x*x) + a4*x + 2*a6 - a3*self.y) / (2*self.y + a1*x + a3)
+            d = self.y - c*x
             Sum_x = c*c + a1*c - a2 - 2*self.x
             Sum_y = -(c + a1) * Sum_x - d - a3
             return Point(self.curve, Sum_x, Sum_y)
       else:
          c =  (Q.y - self.y) / (Q.x - self.x)
-         d =  (self.y*Q.x - Q.y*self.x) / (Q.x - self.x)
+         d =  self.y - c*self.x
          Sum_x = c*c + a1*c - a2 - self.x - Q.x
          Sum_y = -(c + a1)*Sum_x - d - a3
          return Point(self.curve, Sum_x, Sum_y)
@@ -75,11 +92,28 @@ class Point(object):
    def __mul__(self, n):
        if not isinstance(n, int):
          raise Exception("Can't scale a point by something which isn't an int!")
+       elif self.fixedBase is not None:
+         return self.fixedBase.multiply(n)
        else:
-         if n < 0:
+         if self.curve.order is not None:
+             n = n % self.curve.order
+         elif n < 0:
              return -self * -n
          if n == 0:
              return Ideal(self.curve)
+         elif self.curve.isShortWeierstrass:
+             # width-w NAF, most significant digit first, in Jacobian
+             # coordinates with one inversion at the very end
+             table = self.wnafTable()
+             R = JacobianPoint(self.curve, 1, 1, 0)
+             for d in reversed(wnaf(n, self.wnafWidth)):
+                 R = R.double()
+                 if d > 0:
+                     R = R + table[d >> 1][0]
+                 elif d < 0:
+                     R = R + table[-d >> 1][1]
+
+             return R.toAffine()
          else:
              Q = self
              R = self if n & 1 == 1 else Ideal(self.curve)
@@ -99,6 +133,21 @@ class Point(object):
    def __rmul__(self, n):
       return self * n
 
+   # the odd multiples P, 3P, ..., (2^(w-1) - 1)P together with their negatives
+   def wnafTable(self):
+      if self.oddMultiples is None:
+         double = self.toJacobian().double()
+         multiples = [self.toJacobian()]
+         for _ in range(1, 1 << (self.wnafWidth - 2)):
+            multiples.append(multiples[-1] + double)
+         self.oddMultiples = [(P, -P) for P in batchNormalize(multiples)]
+
+      return self.oddMultiples
+
+   def toJacobian(self):
+      one = type(self.x)(1)
+      return JacobianPoint(self.curve, self.x, self.y, one)
+
    def __list__(self):
       return [self.x, self.y]
 
@@ -152,9 +201,357 @@ class Ideal(Point):
       else:
          return self
 
+   def toJacobian(self):
+      return JacobianPoint(self.curve, 1, 1, 0)
+
    def __eq__(self, other):
       return isinstance(other, Ideal)
 
    def __lt__(self, other):
       return not isinstance(other, Ideal)
 
+
+
+# batchInverse: [FieldElement] -> [FieldElement]
+# the inverses of nonzero field elements with a single inversion and 3(n-1)
+# multiplications (Montgomery's trick)
+def batchInverse(elements):
+   if len(elements) == 0:
+      return []
+
+   prefix = [elements[0]]
+   for e in elements[1:]:
+      prefix.append(prefix[-1]*e)
+
+   inv = prefix[-1].inverse()
+   inverses = [None] * len(elements)
+   for i in reversed(range(1, len(elements))):
+      inverses[i] = inv*prefix[i-1]
+      inv = inv*elements[i]
+   inverses[0] = inv
+
+   return inverses
+
+
+# batchNormalize: [JacobianPoint] -> [Point]
+# convert many Jacobian points to affine with a single inversion (shared
+# through batchInverse) instead of one per point
+def batchNormalize(points):
+   finite = [P for P in points if not P.isIdeal()]
+   inverses = iter(batchInverse([P.Z for P in finite]))
+
+   affine = []
+   for P in points:
+      if P.isIdeal():
+         affine.append(Ideal(P.curve))
+      else:
+         zInv = next(inverses)
+         zInv2 = zInv*zInv
+         affine.append(Point(P.curve, P.X*zInv2, P.Y*zInv2*zInv))
+
+   return affine
+
+
+# batchAdd: [(Point, Point)] -> [Point]
+# the affine sums P + Q of many pairs, sharing one inversion between all
+# the slopes. Pairs needing a doubling or involving the ideal are added
+# the ordinary way
+def batchAdd(pairs):
+   general = [i for (i, (P, Q)) in enumerate(pairs) if
+         not isinstance(P, Ideal) and not isinstance(Q, Ideal) and P.x != Q.x]
+   inverses = batchInverse([pairs[i][1].x - pairs[i][0].x for i in general])
+
+   sums = [None] * len(pairs)
+   for (i, inv) in zip(general, inverses):
+      (P, Q) = pairs[i]
+      curve = P.curve
+      c = (Q.y - P.y)*inv
+      d = P.y - c*P.x
+      Sum_x = c*c + curve.a1*c - curve.a2 - P.x - Q.x
+      Sum_y = -(c + curve.a1)*Sum_x - d - curve.a3
+      sums[i] = Point(curve, Sum_x, Sum_y)
+
+   for i in range(len(pairs)):
+      if sums[i] is None:
+         sums[i] = pairs[i][0] + pairs[i][1]
+
+   return sums
+
+
+# wnaf: int, int -> [int]
+# the width-w non-adjacent form of n > 0, least significant digit first. Every
+# nonzero digit is odd with |d| < 2^(w-1), and of any w consecutive digits at
+# most one is nonzero, so n*P needs about bits/(w+1) additions
+def wnaf(n, w):
+   digits = []
+   while n > 0:
+      if n & 1:
+         d = n & ((1 << w) - 1)
+         if d >= 1 << (w - 1):
+            d -= 1 << w
+         n -= d
+      else:
+         d = 0
+      digits.append(d)
+      n >>= 1
+
+   return digits
+
+
+# multiScalarMultiply: [(int, Point)], curve -> Point
+# compute k1*P1 + k2*P2 + ... for nonnegative scalars, sharing the doublings
+# between all terms. Straus' interleaved wNAF is used for a few terms (it
+# reuses the per-point tables of __mul__), Pippenger's bucket method for many.
+# The curve must be in short Weierstrass form.
+def multiScalarMultiply(pairs, curve):
+   pairs = [(k, P) for (k, P) in pairs if k != 0 and not isinstance(P, Ideal)]
+   if len(pairs) < PIPPENGER_THRESHOLD:
+      R = straus(pairs, curve)
+   else:
+      R = pippenger(pairs, curve)
+
+   return R.toAffine()
+
+
+# number of terms from which pippenger beats straus
+PIPPENGER_THRESHOLD = 128
+
+
+def straus(pairs, curve):
+   terms = [(wnaf(k, P.wnafWidth), P.wnafTable()) for (k, P) in pairs]
+   R = JacobianPoint(curve, 1, 1, 0)
+   for i in reversed(range(max([len(digits) for (digits, _) in terms] or [0]))):
+      R = R.double()
+      for (digits, table) in terms:
+         if i < len(digits):
+            d = digits[i]
+            if d > 0:
+               R = R + table[d >> 1][0]
+            elif d < 0:
+               R = R + table[-d >> 1][1]
+
+   return R
+
+
+def pippenger(pairs, curve):
+   # c-bit windows, most significant first; in each window every point is
+   # dropped into the bucket of its digit and the buckets are combined with
+   # a running sum, so the window costs about n + 2^(c+1) additions
+   c = max(2, len(pairs).bit_length() - 3)
+   mask = (1 << c) - 1
+   bits = max([k.bit_length() for (k, _) in pairs])
+
+   R = JacobianPoint(curve, 1, 1, 0)
+   for shift in reversed(range(0, bits, c)):
+      for _ in range(c):
+         R = R.double()
+
+      buckets = [None] * (1 << c)
+      for (k, P) in pairs:
+         d = (k >> shift) & mask
+         if d:
+            buckets[d] = P.toJacobian() if buckets[d] is None else buckets[d] + P
+
+      running = JacobianPoint(curve, 1, 1, 0)
+      windowSum = JacobianPoint(curve, 1, 1, 0)
+      for bucket in reversed(buckets[1:]):
+         if bucket is not None:
+            running = running + bucket
+         windowSum = windowSum + running
+      R = R + windowSum
+
+   return R
+
+
+# Precomputed multiples of a fixed point P of known order, for fast n*P. The
+# scalar is cut into w-bit windows and rows[i][d-1] = d * 2^(w*i) * P, so n*P
+# is the sum of one table entry per nonzero window: no doublings at all and
+# about 256/w mixed additions for a 256 bit order. The table is built on first
+# use and, if a path is given, saved to / loaded from that file.
+class FixedBaseTable(object):
+   def __init__(self, point, order, window=4, path=None):
+      self.point = point
+      self.order = order
+      self.window = window
+      self.path = path
+      self.rows = None
+
+   def multiply(self, n):
+      if self.rows is None:
+         self.build()
+
+      n = n % self.order
+      mask = (1 << self.window) - 1
+      R = JacobianPoint(self.point.curve, 1, 1, 0)
+      for row in self.rows:
+         if n == 0:
+            break
+         d = n & mask
+         if d:
+            R = R + row[d-1]
+         n >>= self.window
+
+      return R.toAffine()
+
+   def build(self):
+      if self.path is not None and os.path.exists(self.path):
+         self.rows = self.load(self.path)
+         if self.rows is not None:
+            return
+
+      # all in Jacobian coordinates, normalized together at the end
+      multiples = []
+      base = self.point.toJacobian()
+      for _ in range((self.order.bit_length() + self.window - 1) // self.window):
+         multiples.append(base)
+         for _ in range(2, 1 << self.window):
+            multiples.append(multiples[-1] + base)
+         base = multiples[-1] + base # 2^w * base
+
+      rowLength = (1 << self.window) - 1
+      points = batchNormalize(multiples)
+      self.rows = [points[i:i + rowLength] for i in range(0, len(points), rowLength)]
+      if self.path is not None:
+         self.save(self.path)
+
+   def save(self, path):
+      data = {'point': (int(self.point.x), int(self.point.y)), 'order': self.order,
+              'window': self.window, 'rows': [[(int(P.x), int(P.y)) for P in row] for row in self.rows]}
+      # processes may load the table while it is written: write a temporary
+      # file and move it in place
+      tmp = '{}.{}.tmp'.format(path, os.getpid())
+      with open(tmp, 'w') as f:
+         json.dump(data, f)
+      os.replace(tmp, path)
+
+   def load(self, path):
+      # returns None if the file holds a table for some other point or window,
+      # or is not a table
+      try:
+         with open(path) as f:
+            data = json.load(f)
+         if (data['point'] != [int(self.point.x), int(self.point.y)] or
+               data['order'] != self.order or data['window'] != self.window or
+               not self.validShape(data['rows']) or data['rows'][0][0] != data['point']):
+            return None
+      except (ValueError, KeyError, TypeError, IndexError):
+         return None
+
+      field = type(self.point.x)
+      return [[Point(self.point.curve, field(x), field(y)) for (x, y) in row] for row in data['rows']]
+
+   def validShape(self, rows):
+      # a row of 2^window - 1 points per window of the order's bits
+      count = (self.order.bit_length() + self.window - 1) // self.window
+      return (len(rows) == count and
+            all(len(row) == (1 << self.window) - 1 and all(len(P) == 2 for P in row) for row in rows))
+
+
+# A point (X : Y : Z) in Jacobian coordinates, standing for the affine point
+# (X/Z^2, Y/Z^3); Z = 0 is the ideal. Doubling and addition need no field
+# inversion, so scalar multiplication works in this representation and only
+# converts back to an affine Point once, when the result is handed out.
+# Only short Weierstrass curves y^2 = x^3 + a4x + a6 are supported.
+class JacobianPoint(object):
+   def __init__(self, curve, X, Y, Z):
+      self.curve = curve
+      self.X = X
+      self.Y = Y
+      self.Z = Z
+
+   def isIdeal(self):
+      return self.Z == 0
+
+   def toAffine(self):
+      if self.isIdeal():
+         return Ideal(self.curve)
+
+      zInv = self.Z.inverse()
+      zInv2 = zInv*zInv
+      return Point(self.curve, self.X*zInv2, self.Y*zInv2*zInv)
+
+   def __neg__(self):
+      return JacobianPoint(self.curve, self.X, -self.Y, self.Z)
+
+   def double(self):
+      if self.isIdeal() or self.Y == 0:
+         return JacobianPoint(self.curve, 1, 1, 0)
+
+      X1, Y1, Z1 = self.X, self.Y, self.Z
+      XX = X1*X1
+      YY = Y1*Y1
+      YYYY = YY*YY
+      S = 2*((X1 + YY)*(X1 + YY) - XX - YYYY)
+
+      if self.curve.a4 == 0:
+         # dbl-2009-l, specialized for a4 = 0 (e.g. secp256k1)
+         M = 3*XX
+         Z3 = 2*Y1*Z1
+      else:
+         # dbl-2007-bl
+         ZZ = Z1*Z1
+         M = 3*XX + self.curve.a4*ZZ*ZZ
+         Z3 = (Y1 + Z1)*(Y1 + Z1) - YY - ZZ
+
+      X3 = M*M - 2*S
+      Y3 = M*(S - X3) - 8*YYYY
+      return JacobianPoint(self.curve, X3, Y3, Z3)
+
+   def __add__(self, Q):
+      if isinstance(Q, Ideal):
+         return self
+      if not isinstance(Q, JacobianPoint):
+         return self._addAffine(Q)
+      if Q.isIdeal():
+         return self
+      if self.isIdeal():
+         return Q
+
+      # add-2007-bl
+      Z1Z1 = self.Z*self.Z
+      Z2Z2 = Q.Z*Q.Z
+      U1 = self.X*Z2Z2
+      U2 = Q.X*Z1Z1
+      S1 = self.Y*Q.Z*Z2Z2
+      S2 = Q.Y*self.Z*Z1Z1
+      H = U2 - U1
+      r = 2*(S2 - S1)
+      if H == 0:
+         if r == 0:
+            return self.double()
+         return JacobianPoint(self.curve, 1, 1, 0)
+
+      I = (2*H)*(2*H)
+      J = H*I
+      V = U1*I
+      X3 = r*r - J - 2*V
+      Y3 = r*(V - X3) - 2*S1*J
+      Z3 = ((self.Z + Q.Z)*(self.Z + Q.Z) - Z1Z1 - Z2Z2)*H
+      return JacobianPoint(self.curve, X3, Y3, Z3)
+
+   def _addAffine(self, Q):
+      # madd-2007-bl, mixed addition with an affine Point (Z2 = 1)
+      if self.isIdeal():
+         return Q.toJacobian()
+
+      Z1Z1 = self.Z*self.Z
+      U2 = Q.x*Z1Z1
+      S2 = Q.y*self.Z*Z1Z1
+      H = U2 - self.X
+      r = 2*(S2 - self.Y)
+      if H == 0:
+         if r == 0:
+            return self.double()
+         return JacobianPoint(self.curve, 1, 1, 0)
+
+      HH = H*H
+      I = 4*HH
+      J = H*I
+      V = self.X*I
+      X3 = r*r - J - 2*V
+      Y3 = r*(V - X3) - 2*self.Y*J
+      Z3 = (self.Z + H)*(self.Z + H) - Z1Z1 - HH
+      return JacobianPoint(self.curve, X3, Y3, Z3)
+
+   def __sub__(self, Q):
+      return self + -Q
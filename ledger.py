@@ -4,20 +4,56 @@
 # 1. store the encrypted inputs from users
 # 2. store the zkps form users
 
+import bisect
+import collections
+import collections.abc
+import logging
+import sqlite3
+import threading
+import serialize
+from curveParams import I, batchNormalize
+
+logger = logging.getLogger('Main.ledger')
+
+# the wire format of every entry
+CODECS = {
+    'pk_list': serialize.Array(serialize.POINT),
+    'zkp_discretelog_dict': serialize.Array(serialize.PROOFS['discretelog']),
+    'h': serialize.POINT,
+    'h_list': serialize.Array(serialize.POINT),
+    'encrypted_g1': serialize.Array(serialize.CIPHERTEXT),
+    'encrypted_g2': serialize.Array(serialize.CIPHERTEXT),
+    'zkp_dhtuple_dict': serialize.Array(serialize.PROOFS['dhTuple']),
+    # a range proof per value, or one bulletproof for all of them
+    'zkp_range_dict': serialize.Union(serialize.Array(serialize.PROOFS['rangeProof']),
+        serialize.PROOFS['bulletproof']),
+    'zkp_sumRange_dict': serialize.Union(serialize.PROOFS['rangeProof'], serialize.PROOFS['bulletproof']),
+}
+
+# the entries stored by each commit method, in the order of its arguments
+# (followed by the uid)
+COMMITS = {
+    'commit_zkp_discretelog': ['pk_list', 'zkp_discretelog_dict'],
+    'commit_zkp_dhtuple': ['h', 'h_list', 'encrypted_g1', 'encrypted_g2', 'zkp_dhtuple_dict'],
+    'commit_zkp_range': ['zkp_range_dict'],
+    'commit_zkp_sumRange': ['zkp_sumRange_dict'],
+}
+
 class Ledger(object):
+    # commits and phase changes may come from many threads
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.pk_sums = None
+
     # set up the phase of the application: 'c' -- commit, 'p' -- proof, 'r' -- results
     def phase(self, s):
+        with self.lock:
+            return self._phase(s)
+
+    def _phase(self, s):
         if (s == 'c'):
             self.cur_phase = 'c'
-            self.h = {}
-            self.h_list = {}
-            self.pk_list = {}
-            self.encrypted_g1 = {}
-            self.encrypted_g2 = {}
-            self.zkp_discretelog_dict = {}
-            self.zkp_dhtuple_dict = {}
-            self.zkp_range_dict = {}
-            self.zkp_sumRange_dict = {}
+            self.new_round()
             return 1
         if (s == 'p' and self.cur_phase == 'c'):
             self.cur_phase = 'p'
@@ -29,31 +65,214 @@ class Ledger(object):
         else:
             return 0
 
+    def new_round(self):
+        self.pk_sums = None
+        self.h = {}
+        self.h_list = {}
+        self.pk_list = {}
+        self.encrypted_g1 = {}
+        self.encrypted_g2 = {}
+        self.zkp_discretelog_dict = {}
+        self.zkp_dhtuple_dict = {}
+        self.zkp_range_dict = {}
+        self.zkp_sumRange_dict = {}
+
+    def release(self):
+        """
+        Drop the entries of the round, once its results are in (in chunked
+        mode, see streaming.py, a round per block of values)
+        """
+        with self.lock:
+            self.new_round()
+
+    def store(self, uid, **entries):
+        """
+        Record the entries, given as name=value, for uid, e.g. pk_list=pk
+        """
+        for (name, value) in entries.items():
+            getattr(self, name)[uid] = value
+
     def commit_zkp_discretelog(self, pk, zkp_discretelog, uid):
-        if (self.cur_phase != 'c'):
-            return 0
-        self.pk_list[uid] = pk
-        self.zkp_discretelog_dict[uid] = zkp_discretelog
-        print("ledger: {} commited zkp for discrete log".format(uid))
+        with self.lock:
+            if (self.cur_phase != 'c'):
+                return 0
+            self.store(uid, pk_list=pk, zkp_discretelog_dict=zkp_discretelog)
+            self.pk_sums = None
+        logger.info("{} commited zkp for discrete log".format(uid))
+
+    def pk_prefix(self, uid):
+        """
+        For every x, the sums of pk_list[u][x] over the uids below uid, over
+        the uids up to and including uid, and over all uids: (below, through,
+        total). The cumulative sums in uid order are computed once per round,
+        so that each client gets its h_list with a few point operations
+        """
+        with self.lock:
+            if self.pk_sums is None:
+                self.pk_sums = self._pk_sums()
+            (uids, sums) = self.pk_sums
+        return (sums[bisect.bisect_left(uids, uid)], sums[bisect.bisect_right(uids, uid)], sums[-1])
+
+    def _pk_sums(self):
+        # sums[i][x] is the sum of pk_list[u][x] over the first i uids
+        uids = sorted(self.pk_list)
+        keys = [self.pk_list[u] for u in uids]
+        length = len(keys[0]) if keys else 0
+        sums = [[I.toJacobian()] * length]
+        for pk in keys:
+            sums.append([sums[-1][x] + pk[x] for x in range(length)])
+        flat = batchNormalize([P for row in sums for P in row])
+        return (uids, [flat[i*length:(i + 1)*length] for i in range(len(sums))])
 
     def commit_zkp_dhtuple(self, h, h_list, encrypted_g1, encrypted_g2, zkp_dhtuple, uid):
-        if (self.cur_phase != 'p'):
-            return 0
-        self.h[uid] = h
-        self.h_list[uid] = h_list
-        self.encrypted_g1[uid] = encrypted_g1
-        self.encrypted_g2[uid] = encrypted_g2
-        self.zkp_dhtuple_dict[uid] = zkp_dhtuple
-        print("ledger: {} commited zkp for dhtuple".format(uid))
+        with self.lock:
+            if (self.cur_phase != 'p'):
+                return 0
+            self.store(uid, h=h, h_list=h_list, encrypted_g1=encrypted_g1, encrypted_g2=encrypted_g2,
+                    zkp_dhtuple_dict=zkp_dhtuple)
+        logger.info("{} commited zkp for dhtuple".format(uid))
 
     def commit_zkp_range(self, zkp_range, uid):
-        if (self.cur_phase != 'p'):
-            return 0
-        self.zkp_range_dict[uid] = zkp_range
-        print("ledger: {} commited zkp for range".format(uid))
+        with self.lock:
+            if (self.cur_phase != 'p'):
+                return 0
+            self.store(uid, zkp_range_dict=zkp_range)
+        logger.info("{} commited zkp for range".format(uid))
 
     def commit_zkp_sumRange(self, zkp_sumRange, uid):
-        if (self.cur_phase != 'p'):
-            return 0
-        self.zkp_sumRange_dict[uid] = zkp_sumRange
-        print("ledger: {} commited zkp for sum range".format(uid))
\ No newline at end of file
+        with self.lock:
+            if (self.cur_phase != 'p'):
+                return 0
+            self.store(uid, zkp_sumRange_dict=zkp_sumRange)
+        logger.info("{} commited zkp for sum range".format(uid))
+
+class PersistentLedger(Ledger):
+    """
+    A Ledger in an SQLite database, which survives restarts. Commits are
+    only ever appended, as rows (round, phase, name, uid, value) with the value
+    in the wire format of serialize.py, indexed by uid and by phase; a
+    new round (phase 'c') starts with no entries instead of wiping the old
+    ones, and a later commit of an entry replaces an earlier one. The
+    attributes pk_list, h, ... are read-only mappings from uid to value that
+    decode rows on access, and entries() streams a whole phase
+    """
+
+    codecs = CODECS
+
+    def __init__(self, path, cache_size=1024):
+        super().__init__()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS entries (seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'round INTEGER, phase TEXT, name TEXT, uid, value BLOB)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS entries_by_uid ON entries (round, name, uid, seq)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS entries_by_phase ON entries (round, phase, seq)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value)')
+
+        state = dict(self.db.execute('SELECT key, value FROM state'))
+        self.round = state.get('round', 0)
+        self.cur_phase = state.get('phase')
+        self.zkp2s = {}
+        for name in self.codecs:
+            setattr(self, name, _Entries(self, name, cache_size))
+
+    def close(self):
+        self.db.close()
+
+    def _phase(self, s):
+        ok = super()._phase(s)
+        if ok:
+            with self.db:
+                self.db.executemany('INSERT OR REPLACE INTO state VALUES (?, ?)',
+                        [('round', self.round), ('phase', self.cur_phase)])
+        return ok
+
+    def new_round(self):
+        self.round += 1
+        self.pk_sums = None
+        for name in self.codecs:
+            getattr(self, name).cache.clear()
+
+    def release(self):
+        # the rows stay on disk
+        with self.lock:
+            self.pk_sums = None
+            for name in self.codecs:
+                getattr(self, name).cache.clear()
+
+    def store(self, uid, **entries):
+        rows = []
+        for (name, value) in entries.items():
+            rows.append((self.round, self.cur_phase, name, uid, serialize.encode(self.codecs[name], value)))
+        with self.lock, self.db:
+            for name in entries:
+                getattr(self, name).cache.pop(uid, None)
+            self.db.executemany('INSERT INTO entries (round, phase, name, uid, value) VALUES (?, ?, ?, ?, ?)', rows)
+
+    def entries(self, phase=None, round=None):
+        """
+        Generate (uid, name, value) for the entries committed in phase (all
+        phases by default) of round (the current one by default), in commit
+        order, reading them from disk one at a time
+        """
+        if round is None:
+            round = self.round
+        with self.lock:
+            if phase is None:
+                rows = self.db.execute('SELECT uid, name, value FROM entries WHERE round = ? ORDER BY seq', (round, ))
+            else:
+                rows = self.db.execute('SELECT uid, name, value FROM entries WHERE round = ? AND phase = ? '
+                        'ORDER BY seq', (round, phase))
+        while True:
+            # the lock is not held while the caller consumes a batch
+            with self.lock:
+                batch = rows.fetchmany(256)
+            if not batch:
+                return
+            for (uid, name, value) in batch:
+                yield (uid, name, serialize.decode(self.codecs[name], value))
+
+class _Entries(collections.abc.Mapping):
+    """
+    The entries name of the current round of a PersistentLedger, by uid. The
+    last cache_size decoded values are kept in memory
+    """
+
+    def __init__(self, ledger, name, cache_size):
+        self.ledger = ledger
+        self.name = name
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+
+    def __getitem__(self, uid):
+        with self.ledger.lock:
+            return self._get(uid)
+
+    def _get(self, uid):
+        if uid in self.cache:
+            self.cache.move_to_end(uid)
+            return self.cache[uid]
+
+        row = self.ledger.db.execute('SELECT value FROM entries WHERE round = ? AND name = ? AND uid = ? '
+                'ORDER BY seq DESC LIMIT 1', (self.ledger.round, self.name, uid)).fetchone()
+        if row is None:
+            raise KeyError(uid)
+        value = serialize.decode(self.ledger.codecs[self.name], row[0])
+
+        self.cache[uid] = value
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return value
+
+    def __iter__(self):
+        # uids in the order of their first commit, like a dict
+        with self.ledger.lock:
+            rows = self.ledger.db.execute('SELECT uid FROM entries WHERE round = ? AND name = ? '
+                    'GROUP BY uid ORDER BY MIN(seq)', (self.ledger.round, self.name)).fetchall()
+        return iter([uid for (uid, ) in rows])
+
+    def __len__(self):
+        with self.ledger.lock:
+            return self.ledger.db.execute('SELECT COUNT(DISTINCT uid) FROM entries WHERE round = ? AND name = ?',
+                    (self.ledger.round, self.name)).fetchone()[0]
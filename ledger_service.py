@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# Concurrent access to a Ledger, standing in for the smart contract. A
+# LedgerService owns the ledger on an asyncio event loop: commits from any
+# number of clients go through a bounded queue (so submitters wait while it
+# is full) and are applied one at a time, and the phase advances by itself
+# once a quorum of participants has made every commit of the current phase.
+#
+# Zorro clients are synchronous and run in threads of their own, each with a
+# ledger object that looks like a Ledger to them: LedgerClient in the same
+# process, or RemoteLedger over a local socket served by serve().
+
+import asyncio
+import logging
+import socket
+import struct
+import threading
+import collections.abc
+import serialize
+from ledger import CODECS, COMMITS
+
+logger = logging.getLogger('Main.ledger_service')
+
+PHASES = ['c', 'p', 'r']
+
+# the commits every participant makes in each phase
+REQUIRED = {
+    'c': ['commit_zkp_discretelog'],
+    'p': ['commit_zkp_range', 'commit_zkp_dhtuple', 'commit_zkp_sumRange'],
+}
+
+def _check_phase(s):
+    # waiting for anything else would never end
+    if s not in PHASES:
+        raise ValueError('Unknown phase {!r}'.format(s))
+
+def _reached(current, s) -> 'bool':
+    return current in PHASES and PHASES.index(current) >= PHASES.index(s)
+
+class LedgerService(object):
+    """
+    Serves ledger (a Ledger or PersistentLedger) on the running event loop.
+    The phase moves from 'c' to 'p' and from 'p' to 'r' as soon as quorum
+    participants have made all commits of the phase (see REQUIRED)
+    """
+
+    def __init__(self, ledger, quorum : 'int', queue_size : 'int' = 64):
+        self.ledger = ledger
+        self.quorum = quorum
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.changed = asyncio.Condition()
+        self.committed = {}
+        self.worker = None
+
+    async def start(self):
+        self.worker = asyncio.ensure_future(self._work())
+
+    async def stop(self):
+        await self.queue.join()
+        self.worker.cancel()
+
+    async def open_round(self):
+        """
+        Start a new round, in the commit phase
+        """
+        await self._set_phase('c')
+
+    async def submit(self, name : 'str', uid, *args):
+        """
+        Make the commit name (e.g. 'commit_zkp_range') for uid with args,
+        waiting while the queue is full. Returns what the ledger returns, 0
+        if the commit was rejected
+        """
+        if name not in COMMITS:
+            raise ValueError('Unknown commit {}'.format(name))
+        done = asyncio.Future()
+        await self.queue.put((name, uid, args, done))
+        return await done
+
+    async def wait_phase(self, s : 'str') -> 'str':
+        """
+        Wait until the round has reached phase s, one of PHASES
+        """
+        _check_phase(s)
+        async with self.changed:
+            await self.changed.wait_for(lambda: _reached(self.ledger.cur_phase, s))
+        return self.ledger.cur_phase
+
+    async def _work(self):
+        while True:
+            (name, uid, args, done) = await self.queue.get()
+            try:
+                result = getattr(self.ledger, name)(*args, uid)
+                if result != 0:
+                    self.committed.setdefault(name, set()).add(uid)
+                    await self._advance()
+                done.set_result(result)
+            except Exception as e:
+                done.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    async def _advance(self):
+        phase = self.ledger.cur_phase
+        if phase not in REQUIRED:
+            return
+        for name in REQUIRED[phase]:
+            if len(self.committed.get(name, ())) < self.quorum:
+                return
+        await self._set_phase(PHASES[PHASES.index(phase) + 1])
+
+    async def _set_phase(self, s):
+        if self.ledger.phase(s) == 0:
+            raise RuntimeError('Cannot move the ledger from phase {} to {}'.format(self.ledger.cur_phase, s))
+        if s == 'c':
+            self.committed = {}
+        logger.info("Ledger in phase {}".format(s))
+        async with self.changed:
+            self.changed.notify_all()
+
+class LedgerClient(object):
+    """
+    The ledger of a Zorro client running in a thread other than the one of
+    the service's event loop. Reads go to the ledger, commits to the service,
+    and block while its queue is full
+    """
+
+    def __init__(self, service, loop):
+        self.service = service
+        self.loop = loop
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def wait_phase(self, s):
+        return self._call(self.service.wait_phase(s))
+
+    def __getattr__(self, name):
+        if name in COMMITS:
+            return lambda *args: self._call(self.service.submit(name, args[-1], *args[:-1]))
+        return getattr(self.service.ledger, name)
+
+# Local socket protocol. Every message is a 4 byte length and a body; a
+# request body starts with an operation byte:
+#   S commit index, uid, arguments -> 1 if accepted, 0 if rejected
+#   W phase -> phase, once it is reached
+#   P -> current phase (0 if none)
+#   G entry index, uid -> 1 and the value, or 0
+#   K entry index -> array of uids
+#   H uid -> the arrays of points of ledger.pk_prefix(uid)
+# uids are nonnegative ints, sent as scalars.
+_frame = struct.Struct('>I')
+_commit_names = sorted(COMMITS)
+_entry_names = sorted(CODECS)
+_uids = serialize.Array(serialize.SCALAR)
+_prefix = serialize.Tuple(*[serialize.Array(serialize.POINT)] * 3)
+_arguments = dict([(name, serialize.Tuple(*[CODECS[entry] for entry in COMMITS[name]])) for name in COMMITS])
+
+async def serve(service, host : 'str' = '127.0.0.1', port : 'int' = 0):
+    """
+    Serve the service on a TCP socket; returns the asyncio server (the
+    address is in server.sockets[0].getsockname())
+    """
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                (n, ) = _frame.unpack(await reader.readexactly(_frame.size))
+                body = memoryview(await reader.readexactly(n))
+                reply = await _answer(service, body)
+                writer.write(_frame.pack(len(reply)) + reply)
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+async def _answer(service, body) -> 'bytes':
+    ledger = service.ledger
+    op = bytes(body[:1])
+    if op == b'S':
+        name = _commit_names[body[1]]
+        (uid, offset) = serialize.SCALAR.decode(body, 2)
+        args = serialize.decode(_arguments[name], body[offset:])
+        result = await service.submit(name, uid, *args)
+        return b'\x00' if result == 0 else b'\x01'
+    if op == b'W':
+        return (await service.wait_phase(chr(body[1]))).encode()
+    if op == b'P':
+        return (ledger.cur_phase or '\x00').encode()
+    if op == b'G':
+        name = _entry_names[body[1]]
+        uid = serialize.decode(serialize.SCALAR, body[2:])
+        entries = getattr(ledger, name)
+        if uid not in entries:
+            return b'\x00'
+        return b'\x01' + serialize.encode(CODECS[name], entries[uid])
+    if op == b'K':
+        return serialize.encode(_uids, list(getattr(ledger, _entry_names[body[1]])))
+    if op == b'H':
+        return serialize.encode(_prefix, ledger.pk_prefix(serialize.decode(serialize.SCALAR, body[1:])))
+    raise ValueError('Unknown operation {}'.format(op))
+
+class RemoteLedger(object):
+    """
+    The ledger of a Zorro client, served by serve() at (host, port). The
+    last cache_size entries fetched of each kind are kept until the client
+    sees the phase change (in cur_phase or wait_phase), so that a verifier
+    fetches every entry once per phase
+    """
+
+    def __init__(self, host : 'str', port : 'int', cache_size : 'int' = 1024):
+        self.sock = socket.create_connection((host, port))
+        self.lock = threading.Lock()
+        self.seen_phase = None
+        for name in CODECS:
+            setattr(self, name, _RemoteEntries(self, name, cache_size))
+
+    def close(self):
+        self.sock.close()
+
+    def request(self, body : 'bytes') -> 'bytes':
+        with self.lock:
+            self.sock.sendall(_frame.pack(len(body)) + body)
+            (n, ) = _frame.unpack(self._read(_frame.size))
+            return self._read(n)
+
+    def _read(self, n):
+        data = bytearray()
+        while len(data) < n:
+            chunk = self.sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError('Ledger connection closed')
+            data += chunk
+        return bytes(data)
+
+    @property
+    def cur_phase(self):
+        phase = self.request(b'P').decode()
+        return self._seen(None if phase == '\x00' else phase)
+
+    def wait_phase(self, s):
+        _check_phase(s)
+        return self._seen(self.request(b'W' + s.encode()).decode())
+
+    def _seen(self, phase):
+        # entries are only committed, or dropped by a new round, while the
+        # phase is not the one the cached values were fetched in
+        with self.lock:
+            if phase != self.seen_phase:
+                self.seen_phase = phase
+                for name in CODECS:
+                    getattr(self, name).cache.clear()
+        return phase
+
+    def pk_prefix(self, uid):
+        return serialize.decode(_prefix, self.request(b'H' + serialize.encode(serialize.SCALAR, uid)))
+
+    def __getattr__(self, name):
+        if name in COMMITS:
+            def commit(*args):
+                body = (b'S' + bytes([_commit_names.index(name)]) + serialize.encode(serialize.SCALAR, args[-1]) +
+                        serialize.encode(_arguments[name], args[:-1]))
+                return 0 if self.request(body) == b'\x00' else None
+            return commit
+        raise AttributeError(name)
+
+class _RemoteEntries(collections.abc.Mapping):
+    """
+    The entries name of a RemoteLedger, by uid, with the last cache_size
+    values fetched in the current phase kept in memory
+    """
+
+    def __init__(self, ledger, name, cache_size):
+        self.ledger = ledger
+        self.name = name
+        self.index = bytes([_entry_names.index(name)])
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+
+    def __getitem__(self, uid):
+        with self.ledger.lock:
+            if uid in self.cache:
+                self.cache.move_to_end(uid)
+                return self.cache[uid]
+
+        reply = self.ledger.request(b'G' + self.index + serialize.encode(serialize.SCALAR, uid))
+        if reply[:1] != b'\x01':
+            raise KeyError(uid)
+        value = serialize.decode(CODECS[self.name], memoryview(reply)[1:])
+
+        with self.ledger.lock:
+            self.cache[uid] = value
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return value
+
+    def __iter__(self):
+        return iter(serialize.decode(_uids, self.ledger.request(b'K' + self.index)))
+
+    def __len__(self):
+        return len(list(iter(self)))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# Parallel proof generation. The per-coordinate work of Zorro.prove (the two
+# encryptions of a value, the range proof of the first one and the dhtuple
+# proof linking them) is independent across coordinates, so it is shared out
+# in chunks to a pool of processes started by the client (see workers.py),
+# and the results are put back in coordinate order. Secrets are only sent to
+# these child processes, over the pool's pipes.
+
+import os
+import random
+import workers
+from curveParams import G
+from elgamal import elgamal_encrypt
+from zkplib import rangeProof as zkp_range, dhTuple as zkp_dhTuple
+
+def prove_coordinate(pid : 'str', message : 'int', secret : 'int', pubkey, h, bound : 'int',
+        range_proof : 'bool' = True) -> '(encrypted_g1, range proof, encrypted_g2, dhtuple proof)':
+    """
+    Encrypt message with the randomness secret under pubkey (the coordinate's
+    entry of h_list) and under h (the client's key), prove that the first
+    encryption is of a value below bound (skipped, None, if not range_proof)
+    and that the two encrypt the same value
+    """
+    m = message*G
+    encrypted_g1 = elgamal_encrypt(pubkey, secret, m)
+    prf_range = None
+    if range_proof:
+        prf_range = zkp_range.gen_prf(encrypted_g1, pid=pid, message=message, secret=secret, pubkey=pubkey, bound=bound)
+    encrypted_g2 = elgamal_encrypt(h, secret, m)
+    dhtuple = (G, pubkey - h, secret*G, encrypted_g1[1] - encrypted_g2[1])
+    prf_dhtuple = zkp_dhTuple.gen_prf(dhtuple, pid=pid, secret=secret)
+    return (encrypted_g1, prf_range, encrypted_g2, prf_dhtuple)
+
+def _prove_chunk(coordinates):
+    # workers forked from the client start with a copy of its random state,
+    # and must not draw the same nonces as each other
+    random.seed(os.urandom(32))
+    return [prove_coordinate(*args) for args in coordinates]
+
+class ProverPool(workers.Pool):
+    """
+    A pool of processes running prove_coordinate, e.g.
+
+        with ProverPool(8) as pool:
+            proofs = pool.prove([(pid, message, secret, pubkey, h, bound), ...])
+    """
+
+    def prove(self, coordinates) -> 'list':
+        """
+        coordinates is a list of arguments of prove_coordinate. Returns the
+        results of prove_coordinate, in the same order
+        """
+        futures = [self.submit(_prove_chunk, chunk) for (_, chunk) in self.chunks(coordinates)]
+        proofs = []
+        for future in futures:
+            proofs.extend(self.result(future))
+        return proofs
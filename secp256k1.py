@@ -0,0 +1,488 @@
+#!/usr/bin/env python
+# secp256k1 arithmetic on plain Python ints. A drop-in replacement for the
+# curve, Point and Ideal of elliptic-curves-finite-fields (and the scalar
+# multiplication helpers next to them), specialized to y^2 = x^3 + 7 over F_q:
+# coordinates are ints reduced mod q, there are no field element objects or
+# type checks, and points use __slots__. Points print like the reference
+# ones, so both implementations produce the same proofs.
+
+import json
+import os
+from elliptic import wnaf
+
+q = 2**256 - 2**32 - 2**9 - 2**8 - 2**7 - 2**6 - 2**4 - 1
+order = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+try:
+    pow(2, -1, 7)
+    def _inverse(a):
+        return pow(a, -1, q)
+except ValueError:
+    # before Python 3.8
+    def _inverse(a):
+        return pow(a, q - 2, q)
+
+class Secp256k1(object):
+    """
+    The curve, with the attributes of GeneralizedEllipticCurve
+    """
+    a1 = a2 = a3 = a4 = 0
+    a6 = 7
+    order = order
+    isShortWeierstrass = True
+
+    def testPoint(self, x, y):
+        return (y*y - x*x*x - 7) % q == 0
+
+curve = Secp256k1()
+
+# Jacobian formulas on coordinate tuples, (1, 1, 0) being the ideal
+
+def _double(X1, Y1, Z1):
+    # dbl-2009-l
+    if Z1 == 0 or Y1 == 0:
+        return (1, 1, 0)
+    XX = X1*X1 % q
+    YY = Y1*Y1 % q
+    YYYY = YY*YY % q
+    S = 2*((X1 + YY)*(X1 + YY) - XX - YYYY) % q
+    M = 3*XX
+    X3 = (M*M - 2*S) % q
+    return (X3, (M*(S - X3) - 8*YYYY) % q, 2*Y1*Z1 % q)
+
+def _add_affine(X1, Y1, Z1, x2, y2):
+    # madd-2007-bl
+    if Z1 == 0:
+        return (x2, y2, 1)
+    Z1Z1 = Z1*Z1 % q
+    H = (x2*Z1Z1 - X1) % q
+    r = 2*(y2*Z1*Z1Z1 - Y1) % q
+    if H == 0:
+        if r == 0:
+            return _double(X1, Y1, Z1)
+        return (1, 1, 0)
+    HH = H*H % q
+    I = 4*HH
+    J = H*I
+    V = X1*I
+    X3 = (r*r - J - 2*V) % q
+    return (X3, (r*(V - X3) - 2*Y1*J) % q, ((Z1 + H)*(Z1 + H) - Z1Z1 - HH) % q)
+
+def _add(X1, Y1, Z1, X2, Y2, Z2):
+    # add-2007-bl
+    if Z1 == 0:
+        return (X2, Y2, Z2)
+    if Z2 == 0:
+        return (X1, Y1, Z1)
+    Z1Z1 = Z1*Z1 % q
+    Z2Z2 = Z2*Z2 % q
+    U1 = X1*Z2Z2 % q
+    S1 = Y1*Z2*Z2Z2 % q
+    H = (X2*Z1Z1 - U1) % q
+    r = 2*(Y2*Z1*Z1Z1 - S1) % q
+    if H == 0:
+        if r == 0:
+            return _double(X1, Y1, Z1)
+        return (1, 1, 0)
+    I = 4*H*H % q
+    J = H*I
+    V = U1*I
+    X3 = (r*r - J - 2*V) % q
+    return (X3, (r*(V - X3) - 2*S1*J) % q, ((Z1 + Z2)*(Z1 + Z2) - Z1Z1 - Z2Z2)*H % q)
+
+def _to_affine(X, Y, Z):
+    if Z == 0:
+        return Ideal(curve)
+    zInv = _inverse(Z)
+    zInv2 = zInv*zInv % q
+    return Point(curve, X*zInv2, Y*zInv2*zInv)
+
+class Point(object):
+    __slots__ = ('x', 'y', 'fixedBase', 'oddMultiples')
+
+    curve = curve
+    wnafWidth = 5
+
+    def __init__(self, curve, x, y):
+        self.x = int(x) % q
+        self.y = int(y) % q
+        self.fixedBase = None
+        self.oddMultiples = None
+
+    def __str__(self):
+        return "(%d (mod %d), %d (mod %d))" % (self.x, q, self.y, q)
+
+    def __repr__(self):
+        return str(self)
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __neg__(self):
+        return Point(curve, self.x, q - self.y)
+
+    def __add__(self, Q):
+        if isinstance(Q, Ideal):
+            return self
+        if isinstance(Q, JacobianPoint):
+            return Q + self
+
+        if self.x == Q.x:
+            if (self.y + Q.y) % q == 0:
+                return Ideal(curve)
+            c = 3*self.x*self.x*_inverse(2*self.y) % q
+        else:
+            c = (Q.y - self.y)*_inverse(Q.x - self.x) % q
+        x = (c*c - self.x - Q.x) % q
+        return Point(curve, x, c*(self.x - x) - self.y)
+
+    def __sub__(self, Q):
+        return self + -Q
+
+    def __mul__(self, n):
+        if not isinstance(n, int):
+            raise Exception("Can't scale a point by something which isn't an int!")
+        if self.fixedBase is not None:
+            return self.fixedBase.multiply(n)
+
+        n = n % order
+        if n == 0:
+            return Ideal(curve)
+
+        table = self.wnafTable()
+        (X, Y, Z) = (1, 1, 0)
+        for d in reversed(wnaf(n, self.wnafWidth)):
+            (X, Y, Z) = _double(X, Y, Z)
+            if d > 0:
+                P = table[d >> 1][0]
+                (X, Y, Z) = _add_affine(X, Y, Z, P.x, P.y)
+            elif d < 0:
+                P = table[-d >> 1][1]
+                (X, Y, Z) = _add_affine(X, Y, Z, P.x, P.y)
+        return _to_affine(X, Y, Z)
+
+    def __rmul__(self, n):
+        return self * n
+
+    # the odd multiples P, 3P, ..., (2^(w-1) - 1)P together with their negatives
+    def wnafTable(self):
+        if self.oddMultiples is None:
+            double = _double(self.x, self.y, 1)
+            multiples = [JacobianPoint(curve, self.x, self.y, 1)]
+            for _ in range(1, 1 << (self.wnafWidth - 2)):
+                P = multiples[-1]
+                multiples.append(JacobianPoint(curve, *_add(P.X, P.Y, P.Z, *double)))
+            self.oddMultiples = [(P, -P) for P in batchNormalize(multiples)]
+        return self.oddMultiples
+
+    def toJacobian(self):
+        return JacobianPoint(curve, self.x, self.y, 1)
+
+    def __eq__(self, other):
+        if isinstance(other, Ideal):
+            return False
+        return self.x == other.x and self.y == other.y
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __getitem__(self, index):
+        return [self.x, self.y][index]
+
+    # lexicographic ordering on points
+    def __lt__(self, other):
+        if isinstance(other, Ideal): return False
+        return (self.x, self.y) < (other.x, other.y)
+    def __gt__(self, other):
+        return other.__lt__(self)
+    def __ge__(self, other):
+        return not self < other
+    def __le__(self, other):
+        return not other < self
+
+class Ideal(Point):
+    __slots__ = ()
+
+    def __init__(self, curve):
+        self.fixedBase = None
+        self.oddMultiples = None
+
+    def __neg__(self):
+        return self
+
+    def __str__(self):
+        return "(%r, %r)" % (0, 0)
+
+    def __repr__(self):
+        return "Ideal"
+
+    def __hash__(self):
+        return hash((0, 0))
+
+    def __add__(self, Q):
+        return Q
+
+    def __mul__(self, n):
+        if not isinstance(n, int):
+            raise Exception("Can't scale a point by something which isn't an int!")
+        return self
+
+    def toJacobian(self):
+        return JacobianPoint(curve, 1, 1, 0)
+
+    def __eq__(self, other):
+        return isinstance(other, Ideal)
+
+    def __lt__(self, other):
+        return not isinstance(other, Ideal)
+
+class JacobianPoint(object):
+    """
+    A point (X : Y : Z) standing for (X/Z^2, Y/Z^3), with the interface of
+    elliptic.JacobianPoint
+    """
+    __slots__ = ('X', 'Y', 'Z')
+
+    curve = curve
+
+    def __init__(self, curve, X, Y, Z):
+        self.X = X
+        self.Y = Y
+        self.Z = Z
+
+    def isIdeal(self):
+        return self.Z == 0
+
+    def toAffine(self):
+        return _to_affine(self.X, self.Y, self.Z)
+
+    def __neg__(self):
+        return JacobianPoint(curve, self.X, q - self.Y, self.Z)
+
+    def double(self):
+        return JacobianPoint(curve, *_double(self.X, self.Y, self.Z))
+
+    def __add__(self, Q):
+        if isinstance(Q, Ideal):
+            return self
+        if isinstance(Q, JacobianPoint):
+            return JacobianPoint(curve, *_add(self.X, self.Y, self.Z, Q.X, Q.Y, Q.Z))
+        return JacobianPoint(curve, *_add_affine(self.X, self.Y, self.Z, Q.x, Q.y))
+
+    def __sub__(self, Q):
+        return self + -Q
+
+def encode(P):
+    """
+    The 33 byte SEC1 compressed encoding of P, b'\\x00' for the ideal
+    """
+    if isinstance(P, Ideal):
+        return b'\x00'
+    return bytes([2 + P.y % 2]) + P.x.to_bytes(32, 'big')
+
+def decode(data):
+    """
+    The point with SEC1 compressed encoding data
+    """
+    if data == b'\x00':
+        return Ideal(curve)
+    if len(data) != 33 or data[0] not in (2, 3):
+        raise ValueError('Not the encoding of a curve point')
+
+    x = int.from_bytes(data[1:], 'big')
+    rhs = (x*x*x + 7) % q
+    y = pow(rhs, (q + 1) // 4, q) # q = 3 mod 4
+    if x >= q or y*y % q != rhs:
+        raise ValueError('Not the encoding of a curve point')
+    if y % 2 != data[0] % 2:
+        y = q - y
+
+    return Point(curve, x, y)
+
+# batchInverse: [int] -> [int]
+# the inverses mod q of nonzero ints with a single inversion and 3(n-1)
+# multiplications (Montgomery's trick)
+def batchInverse(elements):
+    if len(elements) == 0:
+        return []
+
+    prefix = [elements[0]]
+    for e in elements[1:]:
+        prefix.append(prefix[-1]*e % q)
+
+    inv = _inverse(prefix[-1])
+    inverses = [None] * len(elements)
+    for i in reversed(range(1, len(elements))):
+        inverses[i] = inv*prefix[i-1] % q
+        inv = inv*elements[i] % q
+    inverses[0] = inv
+
+    return inverses
+
+# batchNormalize: [JacobianPoint] -> [Point]
+def batchNormalize(points):
+    inverses = iter(batchInverse([P.Z for P in points if P.Z != 0]))
+
+    affine = []
+    for P in points:
+        if P.Z == 0:
+            affine.append(Ideal(curve))
+        else:
+            zInv = next(inverses)
+            zInv2 = zInv*zInv % q
+            affine.append(Point(curve, P.X*zInv2, P.Y*zInv2*zInv))
+
+    return affine
+
+# batchAdd: [(Point, Point)] -> [Point]
+def batchAdd(pairs):
+    general = [i for (i, (P, Q)) in enumerate(pairs) if
+            not isinstance(P, Ideal) and not isinstance(Q, Ideal) and P.x != Q.x]
+    inverses = batchInverse([pairs[i][1].x - pairs[i][0].x for i in general])
+
+    sums = [None] * len(pairs)
+    for (i, inv) in zip(general, inverses):
+        (P, Q) = pairs[i]
+        c = (Q.y - P.y)*inv % q
+        x = (c*c - P.x - Q.x) % q
+        sums[i] = Point(curve, x, c*(P.x - x) - P.y)
+
+    for i in range(len(pairs)):
+        if sums[i] is None:
+            sums[i] = pairs[i][0] + pairs[i][1]
+
+    return sums
+
+# number of terms from which pippenger beats straus
+PIPPENGER_THRESHOLD = 128
+
+# multiScalarMultiply: [(int, Point)], curve -> Point
+# k1*P1 + k2*P2 + ... for nonnegative scalars, see elliptic.multiScalarMultiply
+def multiScalarMultiply(pairs, curve):
+    pairs = [(k, P) for (k, P) in pairs if k != 0 and not isinstance(P, Ideal)]
+    if len(pairs) < PIPPENGER_THRESHOLD:
+        return _to_affine(*_straus(pairs))
+    return _to_affine(*_pippenger(pairs))
+
+def _straus(pairs):
+    terms = [(wnaf(k, P.wnafWidth), P.wnafTable()) for (k, P) in pairs]
+    (X, Y, Z) = (1, 1, 0)
+    for i in reversed(range(max([len(digits) for (digits, _) in terms] or [0]))):
+        (X, Y, Z) = _double(X, Y, Z)
+        for (digits, table) in terms:
+            if i < len(digits):
+                d = digits[i]
+                if d > 0:
+                    P = table[d >> 1][0]
+                    (X, Y, Z) = _add_affine(X, Y, Z, P.x, P.y)
+                elif d < 0:
+                    P = table[-d >> 1][1]
+                    (X, Y, Z) = _add_affine(X, Y, Z, P.x, P.y)
+    return (X, Y, Z)
+
+def _pippenger(pairs):
+    c = max(2, len(pairs).bit_length() - 3)
+    mask = (1 << c) - 1
+    bits = max([k.bit_length() for (k, _) in pairs])
+
+    R = (1, 1, 0)
+    for shift in reversed(range(0, bits, c)):
+        for _ in range(c):
+            R = _double(*R)
+
+        buckets = [(1, 1, 0)] * (1 << c)
+        for (k, P) in pairs:
+            d = (k >> shift) & mask
+            if d:
+                buckets[d] = _add_affine(*buckets[d], P.x, P.y)
+
+        running = (1, 1, 0)
+        windowSum = (1, 1, 0)
+        for bucket in reversed(buckets[1:]):
+            running = _add(*running, *bucket)
+            windowSum = _add(*windowSum, *running)
+        R = _add(*R, *windowSum)
+
+    return R
+
+class FixedBaseTable(object):
+    """
+    Precomputed multiples of a fixed point, see elliptic.FixedBaseTable (and
+    the same file format); rows hold (x, y) int pairs
+    """
+
+    def __init__(self, point, order, window=4, path=None):
+        self.point = point
+        self.order = order
+        self.window = window
+        self.path = path
+        self.rows = None
+
+    def multiply(self, n):
+        if self.rows is None:
+            self.build()
+
+        n = n % self.order
+        mask = (1 << self.window) - 1
+        (X, Y, Z) = (1, 1, 0)
+        for row in self.rows:
+            if n == 0:
+                break
+            d = n & mask
+            if d:
+                (x, y) = row[d-1]
+                (X, Y, Z) = _add_affine(X, Y, Z, x, y)
+            n >>= self.window
+
+        return _to_affine(X, Y, Z)
+
+    def build(self):
+        if self.path is not None and os.path.exists(self.path):
+            self.rows = self.load(self.path)
+            if self.rows is not None:
+                return
+
+        multiples = []
+        base = self.point.toJacobian()
+        for _ in range((self.order.bit_length() + self.window - 1) // self.window):
+            multiples.append(base)
+            for _ in range(2, 1 << self.window):
+                multiples.append(multiples[-1] + base)
+            base = multiples[-1] + base # 2^w * base
+
+        rowLength = (1 << self.window) - 1
+        points = [(P.x, P.y) for P in batchNormalize(multiples)]
+        self.rows = [points[i:i + rowLength] for i in range(0, len(points), rowLength)]
+        if self.path is not None:
+            self.save(self.path)
+
+    def save(self, path):
+        data = {'point': (self.point.x, self.point.y), 'order': self.order,
+                'window': self.window, 'rows': self.rows}
+        # processes may load the table while it is written: write a temporary
+        # file and move it in place
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        # returns None if the file holds a table for some other point or
+        # window, or is not a table
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if (data['point'] != [self.point.x, self.point.y] or
+                    data['order'] != self.order or data['window'] != self.window or
+                    not self.validShape(data['rows']) or data['rows'][0][0] != data['point']):
+                return None
+        except (ValueError, KeyError, TypeError, IndexError):
+            return None
+
+        return [[tuple(P) for P in row] for row in data['rows']]
+
+    def validShape(self, rows):
+        # a row of 2^window - 1 points per window of the order's bits
+        count = (self.order.bit_length() + self.window - 1) // self.window
+        return (len(rows) == count and
+                all(len(row) == (1 << self.window) - 1 and all(len(P) == 2 for P in row) for row in rows))
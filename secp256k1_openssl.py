@@ -1,92 +1,368 @@
+#!/usr/bin/env python
+# secp256k1 arithmetic in libcrypto (OpenSSL) through ctypes. Offers the same
+# curve, Point and Ideal interface (and scalar multiplication helpers) as
+# secp256k1.py, so it can be selected in curveParams. Every Point owns one
+# EC_POINT, freed with the Point; BIGNUMs are freed right after use, and
+# every thread has a BN_CTX of its own (they are not thread safe).
+
 import ctypes
 import ctypes.util
-from serialize import uint256_to_str, uint256_from_str
+import threading
+from secp256k1 import Secp256k1, q, order
+
+_path = ctypes.util.find_library('crypto')
+if _path is None:
+    raise ImportError('libcrypto not found')
+_lib = ctypes.cdll.LoadLibrary(_path)
 
-_ssl = ctypes.cdll.LoadLibrary(ctypes.util.find_library('ssl') or 'libeay32')
-_ssl.BN_bn2hex.restype = ctypes.c_char_p
-# this specifies the curve used with ECDSA.
 _NID_secp256k1 = 714 # from openssl/obj_mac.h
+_POINT_CONVERSION_COMPRESSED = 2
+
+def _check(result, func, args):
+    if result == 0:
+        raise RuntimeError('libcrypto: {} failed'.format(func.__name__))
+    return result
+
+def _declare(name, restype, argtypes, check=False):
+    func = getattr(_lib, name)
+    func.restype = restype
+    func.argtypes = argtypes
+    if check:
+        func.errcheck = _check
+    return func
+
+_p = ctypes.c_void_p
+_BN_new = _declare('BN_new', _p, [], True)
+_BN_free = _declare('BN_free', None, [_p])
+_BN_bin2bn = _declare('BN_bin2bn', _p, [ctypes.c_char_p, ctypes.c_int, _p], True)
+_BN_bn2bin = _declare('BN_bn2bin', ctypes.c_int, [_p, ctypes.c_char_p])
+_BN_num_bits = _declare('BN_num_bits', ctypes.c_int, [_p])
+_BN_CTX_new = _declare('BN_CTX_new', _p, [], True)
+_BN_CTX_free = _declare('BN_CTX_free', None, [_p])
+_EC_GROUP_get0_generator = _declare('EC_GROUP_get0_generator', _p, [_p], True)
+_EC_GROUP_precompute_mult = _declare('EC_GROUP_precompute_mult', ctypes.c_int, [_p, _p], True)
+_EC_GROUP_new_by_curve_name = _declare('EC_GROUP_new_by_curve_name', _p, [ctypes.c_int], True)
+_EC_POINT_new = _declare('EC_POINT_new', _p, [_p], True)
+_EC_POINT_free = _declare('EC_POINT_free', None, [_p])
+_EC_POINT_dup = _declare('EC_POINT_dup', _p, [_p, _p], True)
+_EC_POINT_add = _declare('EC_POINT_add', ctypes.c_int, [_p, _p, _p, _p, _p], True)
+_EC_POINT_invert = _declare('EC_POINT_invert', ctypes.c_int, [_p, _p, _p], True)
+_EC_POINT_mul = _declare('EC_POINT_mul', ctypes.c_int, [_p, _p, _p, _p, _p, _p], True)
+_EC_POINTs_mul = _declare('EC_POINTs_mul', ctypes.c_int,
+        [_p, _p, _p, ctypes.c_size_t, ctypes.POINTER(_p), ctypes.POINTER(_p), _p], True)
+_EC_POINTs_make_affine = _declare('EC_POINTs_make_affine', ctypes.c_int,
+        [_p, ctypes.c_size_t, ctypes.POINTER(_p), _p], True)
+_EC_POINT_cmp = _declare('EC_POINT_cmp', ctypes.c_int, [_p, _p, _p, _p])
+_EC_POINT_is_at_infinity = _declare('EC_POINT_is_at_infinity', ctypes.c_int, [_p, _p])
+_EC_POINT_set_to_infinity = _declare('EC_POINT_set_to_infinity', ctypes.c_int, [_p, _p], True)
+_EC_POINT_set_affine_coordinates = _declare('EC_POINT_set_affine_coordinates_GFp',
+        ctypes.c_int, [_p, _p, _p, _p, _p])
+_EC_POINT_get_affine_coordinates = _declare('EC_POINT_get_affine_coordinates_GFp',
+        ctypes.c_int, [_p, _p, _p, _p, _p], True)
+_EC_POINT_point2oct = _declare('EC_POINT_point2oct', ctypes.c_size_t,
+        [_p, _p, ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, _p], True)
+_EC_POINT_oct2point = _declare('EC_POINT_oct2point', ctypes.c_int,
+        [_p, _p, ctypes.c_char_p, ctypes.c_size_t, _p])
+
+_group = _EC_GROUP_new_by_curve_name(_NID_secp256k1)
+
+class _Context(object):
+    """
+    A BN_CTX, freed with the object
+    """
+
+    def __init__(self):
+        self.ctx = _BN_CTX_new()
+
+    def __del__(self):
+        if _BN_CTX_free is not None:
+            _BN_CTX_free(self.ctx)
+
+_local = threading.local()
+
+def _ctx():
+    """
+    The BN_CTX of the calling thread
+    """
+    try:
+        return _local.context.ctx
+    except AttributeError:
+        _local.context = _Context()
+        return _local.context.ctx
+
+# multiples of the generator, used by EC_POINT_mul for its g_scalar
+_EC_GROUP_precompute_mult(_group, _ctx())
+
+def _bn(n):
+    """
+    A new BIGNUM holding the int 0 <= n < 2^256, to be freed with _BN_free
+    """
+    return _BN_bin2bn(n.to_bytes(32, 'big'), 32, None)
+
+def _int(bn):
+    buf = ctypes.create_string_buffer((_BN_num_bits(bn) + 7) // 8)
+    _BN_bn2bin(bn, buf)
+    return int.from_bytes(buf.raw, 'big')
+
+def _wrap(point):
+    """
+    The Point (or Ideal) owning the EC_POINT point
+    """
+    P = Ideal.__new__(Ideal) if _EC_POINT_is_at_infinity(_group, point) else Point.__new__(Point)
+    P.point = point
+    P.coords = None
+    P.fixedBase = None
+    return P
+
+curve = Secp256k1()
 
-# test that openssl support secp256k1
-if _ssl.EC_KEY_new_by_curve_name(_NID_secp256k1) == 0:
-    errno = _ssl.ERR_get_error()
-    errmsg = ctypes.create_string_buffer(120)
-    _ssl.ERR_error_string_n(errno, errmsg, 120)
-    raise RuntimeError('openssl error: %s' % errmsg.value)
-
-
-# Thx to Sam Devlin for the ctypes magic 64-bit fix.
-def _check_result (val, func, args):
-    if val == 0:
-        raise ValueError
-    else:
-        return ctypes.c_void_p(val)
-
-_ssl.EC_KEY_new_by_curve_name.restype = ctypes.c_void_p
-_ssl.EC_KEY_new_by_curve_name.errcheck = _check_result
-
-curve = _ssl.EC_KEY_new_by_curve_name(_NID_secp256k1)
-group = _ssl.EC_KEY_get0_group(curve)
-order = _ssl.BN_new()
-_ctx = _ssl.BN_CTX_new()
-_ssl.EC_GROUP_get_order(group, order, _ctx)
-
-class SPoint(object):
-    _fields_ = [('point',int)]
-
-    def __init__(self, x=None, y=None, ybit=None, _point=None):
-        assert x is None or type(x) is long
-        assert ybit is None or type(ybit) is int
-        if x is None:
-            assert y is None
-            assert _point is not None
-            self.point = _point
-            return
-        else:
-            assert y is not None or ybit is not None
-            assert _point is None
-
-        self.point = _ssl.EC_POINT_new(group)
-        ctx = _ssl.BN_CTX_new()
-        x = _ssl.BN_bin2bn(uint256_to_str(x)[::-1], 32, _ssl.BN_new())
-        
-        if y is not None:
-            y = _ssl.BN_bin2bn(uint256_to_str(y)[::-1], 32, _ssl.BN_new())
-            _ssl.EC_POINT_set_affine_coordinates_GFp(group, self.point, x, y, ctx)
-        else:
-            _ssl.EC_POINT_set_compressed_coordinates_GFp(group, self.point, x, y%2, ctx)
-
-        _check = _ssl.EC_POINT_is_on_curve(group, self.point, ctx)
-        assert _check
-
-        _ssl.BN_CTX_free(ctx)
-
-    def _coords(self):
-        ctx = _ssl.BN_CTX_new()
-        x = _ssl.BN_new()
-        y = _ssl.BN_new()
-        _ssl.EC_POINT_get_affine_coordinates_GFp(group, self.point, x, y, ctx)
-        def _bn2bin(bn):
-            buf = ctypes.create_string_buffer(32)            
-            size = _ssl.BN_bn2bin(bn, ctypes.byref(buf))
-            n = uint256_from_str(buf[:size][::-1]+(32-size)*'\x00')
-            return n
-        x = _bn2bin(x)
-        y = _bn2bin(y)
-        _ssl.BN_CTX_free(ctx)
-        return x,y
-
-    def mult(self, x):
-        assert type(x) is long
-        result = _ssl.EC_POINT_new(group)
-        ctx = _ssl.BN_CTX_new()
-        x = _ssl.BN_bin2bn(uint256_to_str(x)[::-1], 32, _ssl.BN_new())
-        _ssl.EC_POINT_mul(group, result, None, self.point, x, ctx)
-        _ssl.BN_CTX_free(ctx)
-        return SPoint(_point=result)
-
-    def __destroy__(self):
-        _ssl.EC_POINT_free(self.point)
+class Point(object):
+    __slots__ = ('point', 'coords', 'fixedBase')
+
+    curve = curve
+
+    def __init__(self, curve, x, y):
+        self.point = _EC_POINT_new(_group)
+        self.coords = None
+        self.fixedBase = None
+        (X, Y) = (_bn(int(x) % q), _bn(int(y) % q))
+        try:
+            ok = _EC_POINT_set_affine_coordinates(_group, self.point, X, Y, _ctx())
+        finally:
+            _BN_free(X)
+            _BN_free(Y)
+        if not ok:
+            raise Exception('The point %s is not on the given curve %s!' % ((int(x), int(y)), curve))
+
+    def __del__(self):
+        if _EC_POINT_free is not None and self.point is not None:
+            _EC_POINT_free(self.point)
+            self.point = None
+
+    def _affine(self):
+        if self.coords is None:
+            (x, y) = (_BN_new(), _BN_new())
+            try:
+                _EC_POINT_get_affine_coordinates(_group, self.point, x, y, _ctx())
+                self.coords = (_int(x), _int(y))
+            finally:
+                _BN_free(x)
+                _BN_free(y)
+        return self.coords
+
+    @property
+    def x(self):
+        return self._affine()[0]
+
+    @property
+    def y(self):
+        return self._affine()[1]
+
+    def __str__(self):
+        return "(%d (mod %d), %d (mod %d))" % (self.x, q, self.y, q)
 
     def __repr__(self):
-        return 'SPoint()'
+        return str(self)
+
+    def __hash__(self):
+        return hash(self._affine())
+
+    def __neg__(self):
+        point = _EC_POINT_dup(self.point, _group)
+        _EC_POINT_invert(_group, point, _ctx())
+        return _wrap(point)
+
+    def __add__(self, Q):
+        point = _EC_POINT_new(_group)
+        _EC_POINT_add(_group, point, self.point, Q.point, _ctx())
+        return _wrap(point)
+
+    def __sub__(self, Q):
+        return self + -Q
+
+    def __mul__(self, n):
+        if not isinstance(n, int):
+            raise Exception("Can't scale a point by something which isn't an int!")
+        if self.fixedBase is not None:
+            return self.fixedBase.multiply(n)
+
+        point = _EC_POINT_new(_group)
+        k = _bn(n % order)
+        try:
+            _EC_POINT_mul(_group, point, None, self.point, k, _ctx())
+        finally:
+            _BN_free(k)
+        return _wrap(point)
+
+    def __rmul__(self, n):
+        return self * n
+
+    def encode(self):
+        """
+        The 33 byte SEC1 compressed encoding
+        """
+        buf = ctypes.create_string_buffer(33)
+        size = _EC_POINT_point2oct(_group, self.point, _POINT_CONVERSION_COMPRESSED, buf, 33, _ctx())
+        return buf.raw[:size]
+
+    @staticmethod
+    def decode(data):
+        """
+        The point with SEC1 encoding data (compressed or not), the ideal for b'\\x00'
+        """
+        data = bytes(data)
+        point = _EC_POINT_new(_group)
+        if not _EC_POINT_oct2point(_group, point, data, len(data), _ctx()):
+            _EC_POINT_free(point)
+            raise ValueError('Not the encoding of a curve point')
+        return _wrap(point)
+
+    # libcrypto points are projective already
+    def toJacobian(self):
+        return self
+
+    def toAffine(self):
+        return self
+
+    def isIdeal(self):
+        return False
+
+    def __eq__(self, other):
+        return _EC_POINT_cmp(_group, self.point, other.point, _ctx()) == 0
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __getitem__(self, index):
+        return [self.x, self.y][index]
+
+    # lexicographic ordering on points
+    def __lt__(self, other):
+        if isinstance(other, Ideal): return False
+        return self._affine() < other._affine()
+    def __gt__(self, other):
+        return other.__lt__(self)
+    def __ge__(self, other):
+        return not self < other
+    def __le__(self, other):
+        return not other < self
+
+    def __reduce__(self):
+        return (decode, (self.encode(),))
+
+class Ideal(Point):
+    __slots__ = ()
+
+    def __init__(self, curve):
+        self.point = _EC_POINT_new(_group)
+        self.coords = None
+        self.fixedBase = None
+        _EC_POINT_set_to_infinity(_group, self.point)
+
+    def _affine(self):
+        return (0, 0)
+
+    def __str__(self):
+        return "(%r, %r)" % (0, 0)
+
+    def __repr__(self):
+        return "Ideal"
+
+    def __neg__(self):
+        return self
+
+    def __add__(self, Q):
+        return Q
+
+    def __mul__(self, n):
+        if not isinstance(n, int):
+            raise Exception("Can't scale a point by something which isn't an int!")
+        return self
+
+    def isIdeal(self):
+        return True
+
+    def encode(self):
+        return b'\x00'
+
+    def __lt__(self, other):
+        return not isinstance(other, Ideal)
+
+def encode(P):
+    return P.encode()
+
+def decode(data):
+    return Point.decode(data)
+
+# batchInverse: [int] -> [int]
+def batchInverse(elements):
+    inverses = []
+    inv = 1
+    prefix = []
+    for e in elements:
+        prefix.append(inv)
+        inv = inv*e % q
+    inv = pow(inv, q - 2, q)
+    for (e, p) in zip(reversed(elements), reversed(prefix)):
+        inverses.append(inv*p % q)
+        inv = inv*e % q
+    return inverses[::-1]
+
+# batchNormalize: [Point] -> [Point]
+# libcrypto points are used in any representation, but one inversion for
+# all of them makes their coordinates cheap to read
+def batchNormalize(points):
+    finite = [P.point for P in points if not isinstance(P, Ideal)]
+    if finite:
+        _EC_POINTs_make_affine(_group, len(finite), (_p * len(finite))(*finite), _ctx())
+    return list(points)
+
+# batchAdd: [(Point, Point)] -> [Point]
+def batchAdd(pairs):
+    return batchNormalize([P + Q for (P, Q) in pairs])
+
+# multiScalarMultiply: [(int, Point)], curve -> Point
+# k1*P1 + k2*P2 + ... with EC_POINTs_mul
+def multiScalarMultiply(pairs, curve):
+    pairs = [(k % order, P) for (k, P) in pairs if not isinstance(P, Ideal)]
+    pairs = [(k, P) for (k, P) in pairs if k != 0]
+
+    point = _EC_POINT_new(_group)
+    if not pairs:
+        _EC_POINT_set_to_infinity(_group, point)
+        return _wrap(point)
+
+    scalars = [_bn(k) for (k, _) in pairs]
+    try:
+        _EC_POINTs_mul(_group, point, None, len(pairs), (_p * len(pairs))(*[P.point for (_, P) in pairs]),
+                (_p * len(pairs))(*scalars), _ctx())
+    finally:
+        for k in scalars:
+            _BN_free(k)
+    return _wrap(point)
+
+class FixedBaseTable(object):
+    """
+    Multiples of a fixed point, see elliptic.FixedBaseTable. The generator is
+    multiplied as EC_POINT_mul's g_scalar, which can use the multiples
+    precomputed on import (libcrypto 3 uses its constant time ladder for a
+    lone scalar instead); other points are multiplied as usual. There is no
+    table to build or store, path is ignored
+    """
+
+    def __init__(self, point, order, window=4, path=None):
+        self.point = point
+        self.order = order
+        self.generator = _EC_POINT_cmp(_group, point.point, _EC_GROUP_get0_generator(_group), _ctx()) == 0
+
+    def multiply(self, n):
+        point = _EC_POINT_new(_group)
+        k = _bn(n % self.order)
+        try:
+            if self.generator:
+                _EC_POINT_mul(_group, point, k, None, None, _ctx())
+            else:
+                _EC_POINT_mul(_group, point, None, self.point.point, k, _ctx())
+        finally:
+            _BN_free(k)
+        return _wrap(point)
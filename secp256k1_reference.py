@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# secp256k1 on the generic elliptic curve library of
+# elliptic-curves-finite-fields: field elements are IntegerModP objects and
+# every operation is type checked. Slow, but the reference the other backends
+# are tested against.
+
+from finitefield.finitefield import FiniteField
+from elliptic import GeneralizedEllipticCurve, Point, Ideal, FixedBaseTable, multiScalarMultiply, batchInverse, batchAdd, batchNormalize
+
+q = 2**256 - 2**32 - 2**9 - 2**8 - 2**7 - 2**6 - 2**4 - 1
+order = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+Fq = FiniteField(q,1)
+
+curve = GeneralizedEllipticCurve(a6=Fq(7)) # E: y2 = x3+7
+curve.order = order # the cofactor is 1, so every scalar can be reduced mod order
+
+def encode(P):
+    """
+    The 33 byte SEC1 compressed encoding of P, b'\\x00' for the ideal
+    """
+    if isinstance(P, Ideal):
+        return b'\x00'
+    return bytes([2 + int(P.y) % 2]) + int(P.x).to_bytes(32, 'big')
+
+def decode(data):
+    """
+    The point with SEC1 compressed encoding data
+    """
+    if data == b'\x00':
+        return Ideal(curve)
+    if len(data) != 33 or data[0] not in (2, 3):
+        raise ValueError('Not the encoding of a curve point')
+
+    x = int.from_bytes(data[1:], 'big')
+    rhs = (x*x*x + 7) % q
+    y = pow(rhs, (q + 1) // 4, q) # q = 3 mod 4
+    if x >= q or y*y % q != rhs:
+        raise ValueError('Not the encoding of a curve point')
+    if y % 2 != data[0] % 2:
+        y = q - y
+
+    return Point(curve, Fq(x), Fq(y))
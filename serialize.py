@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# Binary wire format for ciphertexts and proofs. Points take 33 bytes (SEC1
+# compressed, all zero for the ideal), scalars 32 bytes big-endian mod order,
+# arrays a 4 byte length followed by their elements, and a record (a proof
+# dict) its fields in a fixed order with no names or tags; a union of codecs
+# takes a one byte tag. Decoding reads from a memoryview of the input, so no
+# intermediate copies are made.
+#
+#   data = encode_proof('discretelog', prf)
+#   prf = decode_proof('discretelog', data)
+
+import struct
+from curveParams import I, order, encode as encode_point, decode as decode_point
+
+_length = struct.Struct('>I')
+_ideal = bytes(33)
+
+class PointCodec(object):
+    def encode(self, P, out):
+        out += encode_point(P).rjust(33, b'\x00')
+
+    def decode(self, view, offset):
+        end = offset + 33
+        if end > len(view):
+            raise ValueError('Truncated point at offset {}'.format(offset))
+        data = view[offset:end]
+        if data == _ideal:
+            return (I, end)
+        return (decode_point(data), end)
+
+class ScalarCodec(object):
+    def encode(self, k, out):
+        out += (k % order).to_bytes(32, 'big')
+
+    def decode(self, view, offset):
+        end = offset + 32
+        if end > len(view):
+            raise ValueError('Truncated scalar at offset {}'.format(offset))
+        k = int.from_bytes(view[offset:end], 'big')
+        # encode reduces, so only k < order has one encoding
+        if k >= order:
+            raise ValueError('Scalar out of range at offset {}'.format(offset))
+        return (k, end)
+
+class Tuple(object):
+    """
+    A fixed length tuple, e.g. an ElGamal ciphertext (c1, c2)
+    """
+
+    def __init__(self, *codecs):
+        self.codecs = codecs
+
+    def encode(self, value, out):
+        if len(value) != len(self.codecs):
+            raise ValueError('Expected a tuple of length {}'.format(len(self.codecs)))
+        for (codec, item) in zip(self.codecs, value):
+            codec.encode(item, out)
+
+    def decode(self, view, offset):
+        value = []
+        for codec in self.codecs:
+            (item, offset) = codec.decode(view, offset)
+            value.append(item)
+        return (tuple(value), offset)
+
+class Array(object):
+    """
+    A list of any length of one kind of element
+    """
+
+    def __init__(self, codec):
+        self.codec = codec
+
+    def encode(self, value, out):
+        out += _length.pack(len(value))
+        for item in value:
+            self.codec.encode(item, out)
+
+    def accepts(self, value):
+        return isinstance(value, list)
+
+    def decode(self, view, offset):
+        if offset + _length.size > len(view):
+            raise ValueError('Truncated array at offset {}'.format(offset))
+        (n, ) = _length.unpack_from(view, offset)
+        offset += _length.size
+        # reject lengths the input cannot hold before allocating anything
+        if n > len(view) - offset:
+            raise ValueError('Array length {} exceeds the input'.format(n))
+        value = []
+        for _ in range(n):
+            (item, offset) = self.codec.decode(view, offset)
+            value.append(item)
+        return (value, offset)
+
+class Record(object):
+    """
+    A dict with the given keys, each encoded with its codec
+    """
+
+    def __init__(self, *fields):
+        self.fields = fields
+
+    def encode(self, value, out):
+        for (key, codec) in self.fields:
+            codec.encode(value[key], out)
+
+    def accepts(self, value):
+        return isinstance(value, dict) and all([key in value for (key, _) in self.fields])
+
+    def decode(self, view, offset):
+        value = {}
+        for (key, codec) in self.fields:
+            (value[key], offset) = codec.decode(view, offset)
+        return (value, offset)
+
+class Union(object):
+    """
+    A value of one of several kinds (lists for an Array codec, dicts for a
+    Record codec), encoded by the first codec that accepts it after a one
+    byte tag
+    """
+
+    def __init__(self, *codecs):
+        self.codecs = codecs
+
+    def encode(self, value, out):
+        for (tag, codec) in enumerate(self.codecs):
+            if codec.accepts(value):
+                out.append(tag)
+                codec.encode(value, out)
+                return
+        raise ValueError('No codec for {}'.format(type(value).__name__))
+
+    def decode(self, view, offset):
+        if offset >= len(view) or view[offset] >= len(self.codecs):
+            raise ValueError('Bad union tag at offset {}'.format(offset))
+        return self.codecs[view[offset]].decode(view, offset + 1)
+
+POINT = PointCodec()
+SCALAR = ScalarCodec()
+CIPHERTEXT = Tuple(POINT, POINT)
+
+# the proofs of zkplib, by module
+PROOFS = {}
+PROOFS['discretelog'] = Record(('t', POINT), ('r', SCALAR))
+PROOFS['dhTuple'] = Record(('a', POINT), ('b', POINT), ('z', SCALAR))
+PROOFS['oneOutOfTwo'] = Record(('r1', SCALAR), ('r2', SCALAR), ('a1', POINT), ('b1', POINT),
+        ('a2', POINT), ('b2', POINT), ('d1', SCALAR), ('d2', SCALAR))
+PROOFS['square'] = Record(('C_a', CIPHERTEXT), ('C_b', CIPHERTEXT), ('v', SCALAR), ('z_a', SCALAR), ('z_b', SCALAR))
+PROOFS['rangeProof'] = Record(('zkp01', Array(PROOFS['oneOutOfTwo'])), ('zkp_dhtuple', PROOFS['dhTuple']),
+        ('encrypted_bits', Array(CIPHERTEXT)))
+PROOFS['bulletproof'] = Record(('V', Array(POINT)),
+        ('link', Array(Record(('R1', POINT), ('R2', POINT), ('s1', SCALAR), ('s2', SCALAR)))),
+        ('A', POINT), ('S', POINT), ('T1', POINT), ('T2', POINT), ('tau_x', SCALAR), ('mu', SCALAR),
+        ('t_hat', SCALAR), ('L', Array(POINT)), ('R', Array(POINT)), ('a', SCALAR), ('b', SCALAR))
+
+def encode(codec, value) -> 'bytes':
+    out = bytearray()
+    codec.encode(value, out)
+    return bytes(out)
+
+def decode(codec, data):
+    """
+    Decode data (bytes, bytearray or memoryview) holding exactly one value
+    """
+    view = memoryview(data)
+    (value, offset) = codec.decode(view, 0)
+    if offset != len(view):
+        raise ValueError('{} trailing bytes'.format(len(view) - offset))
+    return value
+
+def encode_proof(kind : 'str', proof : 'dict') -> 'bytes':
+    """
+    kind is the zkplib module of the proof, e.g. 'discretelog'
+    """
+    return encode(PROOFS[kind], proof)
+
+def decode_proof(kind : 'str', data) -> 'dict':
+    return decode(PROOFS[kind], data)
+
+def encode_ciphertexts(cts : '[(Point, Point)]') -> 'bytes':
+    return encode(Array(CIPHERTEXT), cts)
+
+def decode_ciphertexts(data) -> '[(Point, Point)]':
+    return decode(Array(CIPHERTEXT), data)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# Chunked rounds, for vectors too long to hold in memory. The values are taken
+# a block of a fixed size at a time, and every block goes through a round of
+# the ledger of its own (commit, prove, results), after which the ledger
+# releases it. The sum range proof of every block is of the sum of all values
+# so far, so that each block is fully verified when it is aggregated, and the
+# last one bounds the sum of the whole vector. Across blocks the clients only
+# keep these running sums; the memory used is that of one block.
+
+import itertools
+
+def blocks(values, size : 'int'):
+    """
+    Generate the lists of size consecutive values of the iterable values (the
+    last one may be shorter)
+    """
+    values = iter(values)
+    while True:
+        block = list(itertools.islice(values, size))
+        if not block:
+            return
+        yield block
+
+def _phase(ledger, s):
+    if (ledger.phase(s) == 0):
+        raise RuntimeError('Cannot move the ledger from phase {} to {}'.format(ledger.cur_phase, s))
+
+def chunked_round(ledger, clients, vectors, size : 'int'):
+    """
+    A round of the Zorro clients on the ledger, over vectors (an iterable of
+    values per client) a block of size values at a time. Every client commits
+    and proves; the first client verifies the proofs of every block and
+    computes its aggregate, which is generated once all proofs of the block
+    (including the bound on the sums so far) are valid. Raises AssertionError
+    if a proof is invalid, and ValueError if the vectors are not all of the
+    same length (once the shortest one runs out, as they are read lazily)
+    """
+    offset = 0
+    for block in itertools.zip_longest(*[blocks(v, size) for v in vectors]):
+        if any([g is None or len(g) != len(block[0]) for g in block]):
+            raise ValueError('The vectors differ in length, after {} values'.format(offset))
+        _phase(ledger, 'c')
+        for (z, g) in zip(clients, block):
+            z.commit_block(g, offset)
+        _phase(ledger, 'p')
+        for z in clients:
+            z.prove(cumulative=True)
+        _phase(ledger, 'r')
+        sums = clients[0].results(cumulative=True)
+        ledger.release()
+        offset += len(block[0])
+        yield sums
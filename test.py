@@ -1,10 +1,11 @@
 #!/usr/bin/env python
 # a test application 
 
+import sys
 from ledger import Ledger
 from zorro import Zorro
 
-def test_app():
+def test_app(range_proof='bits'):
     l = Ledger()
     g1 = [2, 3, 3]
     g2 = [1, 2, 2]
@@ -14,9 +15,9 @@ def test_app():
     total_bound = 10 # range of the vector
 
     # Phase 0: initiate
-    z1 = Zorro(l, 0, g_length, gmax, total_bound)
-    z2 = Zorro(l, 1, g_length, gmax, total_bound)
-    z3 = Zorro(l, 2, g_length, gmax, total_bound)
+    z1 = Zorro(l, 0, g_length, gmax, total_bound, range_proof)
+    z2 = Zorro(l, 1, g_length, gmax, total_bound, range_proof)
+    z3 = Zorro(l, 2, g_length, gmax, total_bound, range_proof)
 
     print("Phase 1: commit...")
     # Phase 1: commit 
@@ -46,4 +47,5 @@ def test_app():
         print("Phase 3 failed!")
 
 if __name__=="__main__":
-    test_app()
+    # optional argument: the range proof, 'bits' (default) or 'bulletproof'
+    test_app(*sys.argv[1:])
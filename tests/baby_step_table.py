@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import os
+import tempfile
+from curveParams import G
+import utils
+from utils import BabyStepTable, init_baby_giant, baby_giant
+
+def rejected(path):
+    try:
+        BabyStepTable.load(path)
+    except ValueError:
+        return True
+    return False
+
+def run():
+    m = 100
+    path = os.path.join(tempfile.mkdtemp(), 'baby')
+    BabyStepTable.build(m).save(path)
+    table = BabyStepTable.load(path)
+    success = all([table.get(utils.x_key(j*G)) == j for j in range(m)]) and os.listdir(os.path.dirname(path)) == ['baby']
+    print("Baby-step table round trip %s."%('Passed' if success is True else 'Failed'))
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:-1])
+    success = rejected(path)
+    with open(path, 'wb') as f:
+        f.write(data[:10])
+    success = success and rejected(path)
+    print("Truncated table rejected %s."%('Passed' if success is True else 'Failed'))
+
+    # and built again
+    baby_giant.table = None
+    init_baby_giant(m*m, path)
+    success = baby_giant(1234*G) == 1234 and not rejected(path)
+    print("Truncated table rebuilt %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
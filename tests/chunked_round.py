@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+from ledger import Ledger
+from rounds import clients
+from streaming import chunked_round
+
+users = 3
+length = 10
+size = 4
+
+def vector(uid):
+    # values are read one block at a time
+    return ((uid + x) % 3 for x in range(length))
+
+def play_round(range_proof):
+    l = Ledger()
+    zs = clients(l, users, size, 5, 30, range_proof)
+    result = []
+    for sums in chunked_round(l, zs, [vector(uid) for uid in range(users)], size):
+        result += sums
+    expected = [sum([(uid + x) % 3 for uid in range(users)]) for x in range(length)]
+    return result == expected and len(l.pk_list) == 0
+
+def play_tampered_round():
+    # a bad sum range proof in the first block: no aggregate is handed out
+    l = Ledger()
+    zs = clients(l, users, size, 5, 30)
+    commit = l.commit_zkp_sumRange
+    def tampered(prf, uid):
+        if (uid == 1):
+            prf['zkp_dhtuple']['z'] += 1
+        return commit(prf, uid)
+    l.commit_zkp_sumRange = tampered
+    result = []
+    try:
+        for sums in chunked_round(l, zs, [vector(uid) for uid in range(users)], size):
+            result += sums
+    except AssertionError:
+        return result == []
+    return False
+
+def play_uneven_round():
+    l = Ledger()
+    zs = clients(l, 2, size, 5, 30)
+    try:
+        list(chunked_round(l, zs, [vector(0), list(vector(1))[:-1]], size))
+    except ValueError:
+        return True
+    return False
+
+def run():
+    for range_proof in ['bits', 'bulletproof']:
+        success = play_round(range_proof)
+        print("Chunked round (%s) %s (%d values in blocks of %d)."%(range_proof, 'Passed' if success is True else 'Failed',
+            length, size))
+    success = play_tampered_round()
+    print("Tampered block withheld %s."%('Passed' if success is True else 'Failed'))
+    success = play_uneven_round()
+    print("Vectors of different lengths rejected %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
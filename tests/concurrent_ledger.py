@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import asyncio
+import concurrent.futures
+import random
+from ledger import Ledger, CODECS
+from ledger_service import LedgerService, LedgerClient, RemoteLedger, serve
+from zorro import Zorro
+
+users = 6
+length = 3
+
+class CountingLedger(RemoteLedger):
+    # counts the entries fetched over the socket
+    fetched = 0
+
+    def request(self, body):
+        if body[:1] == b'G':
+            self.fetched += 1
+        return super().request(body)
+
+def participant(ledger, uid, g):
+    # a client in a thread of its own, waiting for the phases of the round
+    z = Zorro(ledger, uid, length, 5, 15)
+    ledger.wait_phase('c')
+    z.commit(g)
+    ledger.wait_phase('p')
+    z.prove()
+    ledger.wait_phase('r')
+    return z.results()
+
+async def play_round(remote):
+    loop = asyncio.get_event_loop()
+    # a small queue, so that submitters have to wait for each other
+    service = LedgerService(Ledger(), quorum=users, queue_size=2)
+    await service.start()
+    if remote:
+        server = await serve(service)
+        address = server.sockets[0].getsockname()[:2]
+        ledgers = [CountingLedger(*address) for _ in range(users)]
+    else:
+        ledgers = [LedgerClient(service, loop) for _ in range(users)]
+
+    gs = [[random.randint(0, 4) for _ in range(length)] for _ in range(users)]
+    # every participant needs a thread, they wait for each other
+    threads = concurrent.futures.ThreadPoolExecutor(max_workers=users)
+    clients = [loop.run_in_executor(threads, participant, ledgers[uid], uid, gs[uid]) for uid in range(users)]
+    await service.open_round()
+    results = await asyncio.gather(*clients)
+
+    if remote:
+        for l in ledgers:
+            l.close()
+        server.close()
+    await service.stop()
+    threads.shutdown()
+
+    expected = [sum([g[x] for g in gs]) for x in range(length)]
+    # a remote client fetches every entry at most once in each of the phases
+    # it reads them in, however long the vectors
+    fetched = all([l.fetched <= 2*len(CODECS)*users for l in ledgers]) if remote else True
+    return all([r == expected for r in results]) and fetched
+
+async def wait_unknown_phase():
+    service = LedgerService(Ledger(), quorum=users)
+    try:
+        await service.wait_phase('x')
+    except ValueError:
+        return True
+    return False
+
+def run():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    success = loop.run_until_complete(play_round(False))
+    print("Concurrent round %s (%d participants)."%('Passed' if success is True else 'Failed', users))
+    success = loop.run_until_complete(play_round(True))
+    print("Concurrent round over a socket %s (%d participants)."%('Passed' if success is True else 'Failed', users))
+    success = loop.run_until_complete(wait_unknown_phase())
+    print("Unknown phase rejected %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# Conformance of the curve backends: the group operations of every available
+# backend must agree with the reference backend, and the zkplib tests must
+# give the same results on every backend.
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import glob
+import os
+import random
+import subprocess
+import backends
+
+# compressed encoding of the base point
+G_encoded = bytes.fromhex('0279BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798')
+
+def transcript(backend, scalars):
+    """
+    Encodings of the results of all group operations for the given scalars
+    """
+    G = backend.decode(G_encoded)
+    I = backend.Ideal(backend.curve)
+    points = [k*G for k in scalars]
+    order = backend.curve.order
+
+    out = []
+    for (P, Q) in zip(points, points[1:]):
+        out += [P + Q, P - Q, -P, P + I, P - P]
+        out.append(backend.decode(backend.encode(P)))
+        out += [str(P == Q), str(P == P), str(P - P == I), str(hash(P))]
+    out.append((order - 1)*G + G)
+    out.append(backend.multiScalarMultiply([(k, P) for (k, P) in zip(scalars, points)], backend.curve))
+    out.append(backend.multiScalarMultiply([(1, G), (order - 1, G)], backend.curve))
+    out.append(str(backend.decode(b'\x00') == I))
+    return [x if isinstance(x, str) else backend.encode(x) for x in out]
+
+def run_zkp_tests(name):
+    env = dict(os.environ, ZORRO_CURVE=name)
+    out = []
+    for test in sorted(glob.glob('zkp_*.py')):
+        result = subprocess.run([sys.executable, test], env=env, stdout=subprocess.PIPE, universal_newlines=True)
+        out.append((test, result.stdout))
+    return out
+
+def run():
+    scalars = [0, 1, 2, 3] + [random.getrandbits(256) for _ in range(8)]
+    reference = transcript(backends.load('reference'), scalars)
+    zkp_reference = run_zkp_tests('reference')
+
+    for name in backends.names():
+        if name not in backends.available():
+            print("Backend %s: not available on this host."%name)
+            continue
+        success = transcript(backends.load(name), scalars) == reference
+        print("Backend %s group operations %s."%(name, 'Passed' if success is True else 'Failed'))
+        success = run_zkp_tests(name) == zkp_reference
+        print("Backend %s zkplib tests %s."%(name, 'Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import random
+from curveParams import G
+import utils
+
+def run():
+    bound = 2**24
+    xs = [random.randrange(bound) for _ in range(5)]
+    success = [utils.kangaroo(x*G, bound) for x in xs] == xs
+    print("Kangaroo discrete log %s (bound 2^24)."%('Passed' if success is True else 'Failed'))
+
+    # a walk that gives up is started again
+    walk = utils._kangaroo_walk
+    walks = []
+    def failing_walk(*args):
+        walks.append(args)
+        if len(walks) == 1:
+            return iter([])
+        return walk(*args)
+    utils._kangaroo_walk = failing_walk
+    success = utils.kangaroo(xs[0]*G, bound) == xs[0] and len(walks) == 2 and walks[0][-1] != walks[1][-1]
+    print("Kangaroo retried %s."%('Passed' if success is True else 'Failed'))
+
+    # but not forever
+    utils._kangaroo_walk = lambda *args: iter([])
+    try:
+        utils.kangaroo(xs[0]*G, bound, attempts=3)
+        success = False
+    except utils.DiscreteLogError:
+        success = True
+    utils._kangaroo_walk = walk
+    print("Kangaroo gives up %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
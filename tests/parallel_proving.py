@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+from curveParams import G
+from ledger import Ledger
+from rounds import clients, commit_and_prove
+
+length = 9
+
+def play_round(range_proof):
+    gs = [[(uid + x) % 5 for x in range(length)] for uid in range(3)]
+    l = Ledger()
+    zs = clients(l, len(gs), length, 5, 40, range_proof, prove_processes=3)
+    commit_and_prove(l, zs, gs)
+    l.phase('r')
+
+    # the proofs come back in the order of the values
+    ordered = all([l.encrypted_g1[z.uid][x][0] == z.secrets[x]*G for z in zs for x in range(length)])
+    # and every worker draws its own nonces
+    nonces = [str(prf['a']) for u in l.zkp_dhtuple_dict for prf in l.zkp_dhtuple_dict[u]]
+    fresh = len(set(nonces)) == len(nonces)
+
+    expected = [sum([g[x] for g in gs]) for x in range(length)]
+    return ordered and fresh and zs[0].results() == expected
+
+def run():
+    for range_proof in ['bits', 'bulletproof']:
+        success = play_round(range_proof)
+        print("Parallel proving (%s) %s."%(range_proof, 'Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
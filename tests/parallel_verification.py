@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import threading
+import verification
+from curveParams import G, order
+from ledger import Ledger
+from rounds import clients, commit_and_prove
+from zorro import Zorro
+from zkplib import dhTuple as zkp_dhTuple
+
+def play_round(range_proof, tamper=False):
+    gs = [[2, 3, 3, 1], [1, 2, 2, 0], [1, 1, 1, 4]]
+    l = Ledger()
+    commit_and_prove(l, clients(l, len(gs), 4, 5, 15, range_proof), gs)
+    l.phase('r')
+    if tamper:
+        # a single bad response in the middle of the dhtuple proofs
+        prf = l.zkp_dhtuple_dict[1][2]
+        prf['z'] = (prf['z'] + 1) % order
+
+    z = Zorro(l, 0, 4, 5, 15, range_proof=range_proof)
+    z.verify_processes = 2
+    expected = [sum([g[x] for g in gs]) for x in range(4)]
+    try:
+        return z.results() == expected
+    except AssertionError:
+        return False
+
+def play_stopped_chunk():
+    # a chunk whose flag is set gives up before its next sub-batch, even
+    # though its proofs are valid
+    items = [((G, G, G, G), dict(pid=0, **zkp_dhTuple.gen_prf((G, G, G, G), pid=0, secret=1))) for _ in range(4)]
+    stop = threading.Event()
+    complete = verification._verify_chunk(zkp_dhTuple.__name__, items, stop, 2) == (True, None)
+    stop.set()
+    return complete and verification._verify_chunk(zkp_dhTuple.__name__, items, stop, 2) is None
+
+def run():
+    for range_proof in ['bits', 'bulletproof']:
+        success = play_round(range_proof)
+        print("Parallel verification (%s) %s."%(range_proof, 'Passed' if success is True else 'Failed'))
+    success = not play_round('bits', tamper=True)
+    print("Tampered proof detected %s."%('Passed' if success is True else 'Failed'))
+    success = play_stopped_chunk()
+    print("Stopped chunk %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import os
+import tempfile
+from ledger import PersistentLedger
+from rounds import clients, commit_and_prove
+from zorro import Zorro
+
+def run():
+    path = os.path.join(tempfile.mkdtemp(), 'ledger.db')
+    gs = [[2, 3, 3], [1, 2, 2], [1, 1, 1]]
+
+    # commit and prove, then drop the ledger as if the process had exited
+    l = PersistentLedger(path)
+    commit_and_prove(l, clients(l, len(gs), 3, 5, 10), gs)
+    l.close()
+
+    # a fresh process: the round and its entries are still there
+    l = PersistentLedger(path)
+    success = l.cur_phase == 'p' and list(l.pk_list) == [0, 1, 2]
+    print("Ledger reopened %s (round %d, phase %s)."%('Passed' if success is True else 'Failed', l.round, l.cur_phase))
+
+    entries = list(l.entries('p'))
+    print("Proof phase entries streamed: %d."%len(entries))
+
+    l.phase('r')
+    print(Zorro(l, 0, 3, 5, 10).results())
+
+    # a new round starts empty, the old one is kept
+    l.phase('c')
+    success = len(l.pk_list) == 0 and len(list(l.entries(round=l.round - 1))) == len(entries) + len(gs)*2
+    print("New round %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import os
+import random
+import tempfile
+from curveParams import G, I, order
+from ledger import Ledger, PersistentLedger
+
+def h_naive(ledger, uid, x):
+    h = I
+    for u in ledger.pk_list:
+        if (u < uid):
+            h += ledger.pk_list[u][x]
+        elif (u > uid):
+            h -= ledger.pk_list[u][x]
+    return h
+
+def check(l):
+    length = 3
+    l.phase('c')
+    # uids committed out of order, with gaps
+    for uid in [7, 2, 5, 0, 9]:
+        l.commit_zkp_discretelog([random.randint(1, order)*G for _ in range(length)], [], uid)
+    l.phase('p')
+
+    success = True
+    for uid in range(11):
+        (below, through, total) = l.pk_prefix(uid)
+        for x in range(length):
+            h = below[x] - (total[x] - through[x])
+            success = success and h == h_naive(l, uid, x)
+
+    # a new round starts without keys
+    l.phase('c')
+    return success and l.pk_prefix(0) == ([], [], [])
+
+def run():
+    success = check(Ledger())
+    print("Prefix sums of public keys %s."%('Passed' if success is True else 'Failed'))
+    success = check(PersistentLedger(os.path.join(tempfile.mkdtemp(), 'ledger.db')))
+    print("Prefix sums of public keys, persistent ledger %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
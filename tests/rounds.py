@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# Setup shared by the tests that play a round: a client per user on one
+# ledger, and the commit and proof phases. Imported by the tests after they
+# have put the repository on sys.path.
+
+from zorro import Zorro
+
+def clients(ledger, users : 'int', length : 'int', gmax : 'int', total_bound : 'int',
+        range_proof : 'str' = 'bits', **settings) -> 'list':
+    """
+    A Zorro client for every uid in range(users) on ledger, with the
+    attributes in settings (e.g. prove_processes=3) set on each
+    """
+    zs = [Zorro(ledger, uid, length, gmax, total_bound, range_proof=range_proof) for uid in range(users)]
+    for z in zs:
+        for (name, value) in settings.items():
+            setattr(z, name, value)
+    return zs
+
+def commit_and_prove(ledger, zs, gs):
+    """
+    Commit gs[i] by zs[i] and prove it; the ledger is left in phase 'p'
+    """
+    ledger.phase('c')
+    for (z, g) in zip(zs, gs):
+        z.commit(g)
+    ledger.phase('p')
+    for z in zs:
+        z.prove()
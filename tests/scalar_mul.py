@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import random
+from curveParams import G, I, order, multi_scalar_mul
+
+def double_and_add(n, P):
+    R = I
+    Q = P
+    while n:
+        if n & 1:
+            R = R + Q
+        Q = Q + Q
+        n >>= 1
+    return R
+
+def run():
+    # scalar multiplication, by G (fixed base table) and by other points (wNAF)
+    success = order*G == I and (order - 1)*G == -G and (-5)*G == -(5*G) and 3*G == G + G + G
+    for _ in range(10):
+        k = random.randint(0, order)
+        P = random.randint(1, order)*G
+        success = success and k*G == double_and_add(k, G) and k*P == double_and_add(k, P)
+    print("Scalar multiplication %s."%('Passed' if success is True else 'Failed'))
+
+    # multi-scalar multiplication, below and above the Pippenger threshold,
+    # with negative and unreduced scalars
+    success = multi_scalar_mul([]) == I and multi_scalar_mul([(order, G)]) == I
+    points = [random.randint(1, order)*G for _ in range(200)]
+    for n in [1, 3, 10, 200]:
+        pairs = [(random.randint(-order, 2*order), P) for P in points[:n]]
+        expected = I
+        for (k, P) in pairs:
+            expected = expected + k*P
+        success = success and multi_scalar_mul(pairs) == expected
+    print("Multi-scalar multiplication %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import os
+import tempfile
+from curveParams import order
+from ledger import Ledger
+from rounds import clients, commit_and_prove
+from verification import VerificationCache
+from zorro import Zorro
+from zkplib import dhTuple
+
+# count the proofs that are actually verified
+verified = [0]
+batch_verify = dhTuple.batch_verify
+def counting_batch_verify(items):
+    verified[0] += len(items)
+    return batch_verify(items)
+dhTuple.batch_verify = counting_batch_verify
+
+def run():
+    path = os.path.join(tempfile.mkdtemp(), 'valid')
+    gs = [[2, 3, 3], [1, 2, 2], [1, 1, 1]]
+    cache = VerificationCache(path)
+
+    l = Ledger()
+    zs = clients(l, len(gs), 3, 5, 10, verification_cache=cache)
+    commit_and_prove(l, zs, gs)
+    l.phase('r')
+
+    results = [z.results() for z in zs]
+    success = all([r == [4, 6, 6] for r in results]) and verified[0] == 9
+    print("Shared cache %s (%d dhtuple proofs verified for %d clients)."%('Passed' if success is True else 'Failed',
+        verified[0], len(zs)))
+
+    # another process with the saved cache verifies nothing
+    cache.save()
+    z = Zorro(l, 0, 3, 5, 10)
+    z.verification_cache = VerificationCache(path)
+    success = len(z.verification_cache) == len(cache) and z.results() == [4, 6, 6] and verified[0] == 9
+    print("Persisted cache %s (%d valid proofs)."%('Passed' if success is True else 'Failed', len(cache)))
+
+    # a changed entry is not in the cache
+    prf = l.zkp_dhtuple_dict[2][1]
+    prf['z'] = (prf['z'] + 1) % order
+    try:
+        z.results()
+        success = False
+    except AssertionError:
+        success = verified[0] == 10
+    print("Tampered proof detected %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
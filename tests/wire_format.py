@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import random
+from curveParams import G, I, order
+from elgamal import elgamal_encrypt
+import serialize
+from zkplib import discretelog as zkp_discretelog, square as zkp_square, rangeProof as zkp_range, bulletproof as zkp_bulletproof
+
+def run():
+    # generate secret-key
+    sk = random.randint(0, order)
+    pk = sk*G
+
+    # every proof must still verify after a round trip through the wire format
+    prf = zkp_discretelog.gen_prf(sk, pk, pid=0)
+    data = serialize.encode_proof('discretelog', prf)
+    success = zkp_discretelog.verify_prf(pk, pid=0, **serialize.decode_proof('discretelog', data))
+    print("Discrete log round trip %s (%d bytes)."%('Passed' if success is True else 'Failed', len(data)))
+
+    r_a, r_b = random.randint(0, order), random.randint(0, order)
+    (A, B) = (elgamal_encrypt(pk, r_a, 6*G), elgamal_encrypt(pk, r_b, 36*G))
+    prf = zkp_square.gen_prf(A, B, pid=0, secret1=r_a, secret2=r_b, message=6, pubkey=pk)
+    data = serialize.encode_proof('square', prf)
+    success = zkp_square.verify_prf(A, B, pid=0, pubkey=pk, **serialize.decode_proof('square', data))
+    print("Square round trip %s (%d bytes)."%('Passed' if success is True else 'Failed', len(data)))
+
+    c = elgamal_encrypt(pk, r_a, 5*G)
+    prf = zkp_range.gen_prf(c, pid=0, message=5, secret=r_a, pubkey=pk, bound=8)
+    data = serialize.encode_proof('rangeProof', prf)
+    success = zkp_range.verify_prf(c, pid=0, pubkey=pk, bound=8, **serialize.decode_proof('rangeProof', data))
+    print("Range round trip %s (%d bytes)."%('Passed' if success is True else 'Failed', len(data)))
+
+    prf = zkp_bulletproof.gen_prf([c], pid=0, message=[5], secret=[r_a], pubkey=[pk], bound=8)
+    data = serialize.encode_proof('bulletproof', prf)
+    success = zkp_bulletproof.verify_prf([c], pid=0, pubkey=[pk], bound=8,
+            **serialize.decode_proof('bulletproof', memoryview(data)))
+    print("Bulletproof round trip %s (%d bytes)."%('Passed' if success is True else 'Failed', len(data)))
+
+    # ciphertexts, including the ideal
+    cts = [c, (I, G), elgamal_encrypt(pk, r_b, I)]
+    success = serialize.decode_ciphertexts(serialize.encode_ciphertexts(cts)) == cts
+    print("Ciphertexts round trip %s."%('Passed' if success is True else 'Failed'))
+
+    # truncated input
+    try:
+        serialize.decode_proof('rangeProof', data[:-1])
+        success = False
+    except ValueError:
+        success = True
+    print("Truncated input rejected %s."%('Passed' if success is True else 'Failed'))
+
+    # order is a second encoding of the scalar 0
+    data = serialize.encode_proof('discretelog', zkp_discretelog.gen_prf(sk, pk, pid=0))
+    data = data[:-32] + order.to_bytes(32, 'big')
+    try:
+        serialize.decode_proof('discretelog', data)
+        success = False
+    except ValueError:
+        success = True
+    print("Unreduced scalar rejected %s."%('Passed' if success is True else 'Failed'))
+
+if __name__=="__main__":
+    run()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+import sys
+sys.path.append('../')
+sys.path.append('../elliptic-curves-finite-fields')
+import random
+from curveParams import G, order
+from elgamal import elgamal_encrypt
+from zkplib import bulletproof as zkp_bulletproof
+
+def run():
+    # generate secret-key
+    sk = random.randint(0, order) 
+    pk = sk*G 
+
+    mmax = 5
+
+    # a single value in range, and one out of range
+    r = random.randint(0, order)
+    c = elgamal_encrypt(pk, r, 3*G)
+    prf = zkp_bulletproof.gen_prf(c, pid=0, message=3, secret=r, pubkey=pk, bound=mmax)
+    success = zkp_bulletproof.verify_prf(c, pid=0, pubkey=pk, bound=mmax, **prf)
+    c2 = elgamal_encrypt(pk, r, 9*G)
+    success2 = zkp_bulletproof.verify_prf(c2, pid=0, pubkey=pk, bound=mmax, **prf)
+
+    print("ZKP verification 0 %s."%('Passed' if success is True else 'Failed'))
+    print("ZKP verification 1 %s."%('Passed' if success2 is True else 'Failed'))
+
+    # a proof over 4 bits does not pass for 3 bits, at the same vector length
+    prf = zkp_bulletproof.gen_prf(c, pid=0, message=3, secret=r, pubkey=pk, bound=16)
+    success = not zkp_bulletproof.verify_prf(c, pid=0, pubkey=pk, bound=mmax, **prf)
+    print("ZKP bound binding %s."%('Passed' if success is True else 'Failed'))
+
+    # one aggregated proof for a vector, every value under its own key
+    m = [1, 4, 0, 7, 2]
+    secrets = [random.randint(0, order) for _ in m]
+    pks = [random.randint(0, order)*G for _ in m]
+    cs = [elgamal_encrypt(pks[i], secrets[i], m[i]*G) for i in range(len(m))]
+    prf = zkp_bulletproof.gen_prf(cs, pid=1, message=m, secret=secrets, pubkey=pks, bound=8)
+    success = zkp_bulletproof.verify_prf(cs, pid=1, pubkey=pks, bound=8, **prf)
+
+    print("ZKP aggregated verification %s (%d values, %d rounds)."%('Passed' if success is True else 'Failed', len(m), len(prf['L'])))
+
+if __name__=="__main__":
+    run()
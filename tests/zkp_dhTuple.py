@@ -6,6 +6,7 @@ sys.path.append('../elliptic-curves-finite-fields')
 import random
 from curveParams import G, order
 from zkplib import dhTuple as zkp_dhTuple
+from zkplib.transcript import Transcript
 
 def run():
     # generate secret-key
@@ -26,5 +27,24 @@ def run():
 
     print("ZKP verification %s."%('Passed' if success is True else 'Failed'))
 
+    # batch of correct tuples, followed by the one above
+    items = []
+    for i in range(1, 10):
+        s = random.randint(0, order)
+        correct = (G, pk, s*G, s*pk)
+        items.append((correct, dict(pid=i, **zkp_dhTuple.gen_prf(correct, pid=i, secret=s))))
+    items.append((dhtuple, dict(pid=0, **prf)))
+    (success, bad) = zkp_dhTuple.batch_verify(items)
+
+    print("ZKP batch verification %s (invalid proof: %s)."%('Passed' if success is True else 'Failed', bad))
+
+    # a statement chosen after the challenge, (g, h, u, v) solved from a
+    # random proof, is not a DH tuple and must not verify
+    (a, b, z) = (random.randint(1, order)*G, random.randint(1, order)*pk, random.randint(1, order))
+    c_inv = pow(Transcript(0, a, b).challenge(), order - 2, order)
+    forged = (G, pk, c_inv*(z*G - a), c_inv*(z*pk - b))
+    success = not zkp_dhTuple.verify_prf(forged, pid=0, a=a, b=b, z=z)
+    print("ZKP forged statement %s."%('Passed' if success is True else 'Failed'))
+
 if __name__=="__main__":
     run()
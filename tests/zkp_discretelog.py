@@ -17,5 +17,17 @@ def run():
 
     print("ZKP verification %s."%('Passed' if success is True else 'Failed'))
 
+    # batch of proofs, one of them for the wrong public key
+    items = []
+    for i in range(10):
+        sk = random.randint(0, order)
+        pk = sk*G
+        prf = zkp_discretelog.gen_prf(sk, pk, pid=i)
+        items.append((pk, dict(pid=i, **prf)))
+    items[7] = (G, items[7][1])
+    (success, bad) = zkp_discretelog.batch_verify(items)
+
+    print("ZKP batch verification %s (invalid proof: %s)."%('Passed' if success is True else 'Failed', bad))
+
 if __name__=="__main__":
     run()
@@ -27,5 +27,16 @@ def run():
 
     print("ZKP verification %s."%('Passed' if success is True else 'Failed'))
 
+    # batch of proofs for both bit values
+    items = []
+    for i in range(10):
+        r = random.randint(0, order)
+        c = elgamal_encrypt(pk, r, (i % 2) * G)
+        prf = zkp_oneOutOfTwo.gen_prf(c[0], c[1], pid=i, message=i % 2, secret=r, pubkey=pk)
+        items.append((c, dict(pid=i, pubkey=pk, **prf)))
+    (success, bad) = zkp_oneOutOfTwo.batch_verify(items)
+
+    print("ZKP batch verification %s (invalid proof: %s)."%('Passed' if success is True else 'Failed', bad))
+
 if __name__=="__main__":
     run()
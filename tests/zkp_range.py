@@ -35,5 +35,9 @@ def run():
     print("ZKP verification 0 %s."%('Passed' if success is True else 'Failed'))
     print("ZKP verification 1 %s."%('Passed' if success2 is True else 'Failed'))
 
+    (success, bad) = zkp_range.batch_verify([(c1, dict(pid=0, pubkey=pk, bound=mmax, **prf)),
+        (c2, dict(pid=1, pubkey=pk, bound=mmax, **prf2))])
+    print("ZKP batch verification %s (invalid proof: %s)."%('Passed' if success is True else 'Failed', bad))
+
 if __name__=="__main__":
     run()
@@ -1,36 +1,366 @@
 #!/usr/bin/env python
 # Utility functions
 
-from curveParams import G
+from curveParams import G, I, Fq, curve, Point, order, batchAdd, batchNormalize
 import math
+import mmap
+import multiprocessing
+import os
+import queue
+import random
+import struct
+import threading
+
+def x_key(P : 'Point') -> 'int':
+    """
+    Fixed-width 64 bit key of a point: the low bits of its x-coordinate. P and
+    -P share a key, and unrelated points collide with probability 2^-64, so a
+    match is only a candidate
+    """
+    if P == I:
+        return 0
+    return int(P.x) & 0xFFFFFFFFFFFFFFFF
+
+class BabyStepTable(object):
+    """
+    The baby steps j*G, 0 <= j < m, as a map from x_key(j*G) to j. Held in a
+    dict when built, or memory-mapped from a file written by save(): an open
+    addressing hash table of 12 byte slots (key, j + 1), so that large tables
+    load instantly and are shared by all processes mapping the same file
+    """
+
+    _header = struct.Struct('<8sQQ') # magic, m, number of slots
+    _slot = struct.Struct('<QI')
+    _magic = b'ZBSGS001'
+
+    def __init__(self, m : 'int'):
+        self.m = m
+        self.entries = None
+        self.map = None
+
+    @classmethod
+    def build(cls, m : 'int', block : 'int' = 1024) -> 'BabyStepTable':
+        table = cls(m)
+        table.entries = dict()
+        P = I.toJacobian()
+        for start in range(0, m, block):
+            points = []
+            for _ in range(min(block, m - start)):
+                points.append(P)
+                P = P + G
+            for (j, Q) in enumerate(batchNormalize(points), start):
+                table.entries.setdefault(x_key(Q), j)
+        return table
+
+    def get(self, key : 'int') -> 'int':
+        """
+        The j stored under key, or None
+        """
+        if self.entries is not None:
+            return self.entries.get(key)
+
+        mask = self.nslots - 1
+        slot = key & mask
+        while True:
+            (k, j) = self._slot.unpack_from(self.map, self._header.size + slot*self._slot.size)
+            if j == 0:
+                return None
+            if k == key:
+                return j - 1
+            slot = (slot + 1) & mask
+
+    def save(self, path : 'str'):
+        nslots = 1
+        while nslots < 2*len(self.entries):
+            nslots *= 2
+
+        slots = bytearray(nslots*self._slot.size)
+        mask = nslots - 1
+        for (key, j) in self.entries.items():
+            slot = key & mask
+            while self._slot.unpack_from(slots, slot*self._slot.size)[1] != 0:
+                slot = (slot + 1) & mask
+            self._slot.pack_into(slots, slot*self._slot.size, key, j + 1)
+
+        # a temporary file of this process, so that processes saving the
+        # same table at once do not write into each other's
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(self._header.pack(self._magic, self.m, nslots))
+            f.write(slots)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path : 'str') -> 'BabyStepTable':
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < cls._header.size:
+                raise ValueError('{} is not a baby-step table'.format(path))
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, m, nslots) = cls._header.unpack_from(data, 0)
+        if magic != cls._magic:
+            raise ValueError('{} is not a baby-step table'.format(path))
+        # get() needs every slot in the file, and a free one to stop at
+        if nslots == 0 or nslots & (nslots - 1) != 0 or nslots <= m or len(data) != cls._header.size + nslots*cls._slot.size:
+            raise ValueError('{} is a truncated or corrupt baby-step table'.format(path))
+
+        table = cls(m)
+        table.map = data
+        table.nslots = nslots
+        return table
+
+class DiscreteLogError(Exception):
+    """
+    The discrete log is not within the bound of the baby-step table
+    """
+    pass
+
+def _giant_steps(beta : 'Point', stride : 'Point', count : 'int', block : 'int' = 64):
+    """
+    Generate x_key(beta + i*stride) for 0 <= i < count. The walk costs one
+    mixed addition per step in Jacobian coordinates, and each block of steps
+    is brought to affine with a single inversion (batchNormalize)
+    """
+    gamma = beta.toJacobian()
+    done = 0
+    while done < count:
+        points = []
+        for _ in range(min(block, count - done)):
+            points.append(gamma)
+            gamma = gamma + stride
+        done += len(points)
+
+        for P in batchNormalize(points):
+            yield x_key(P)
 
 def baby_giant(beta : 'Point') -> 'int':
     """
     Shanks' algorithm for computing the discrete log, i.e.
-    A value x satisfying G^x = beta
+    A value x satisfying G^x = beta. Raises DiscreteLogError if x is not
+    below the bound given to init_baby_giant
+    """
+    table = baby_giant.table
+    m = table.m
+    for (i, key) in enumerate(_giant_steps(beta, table.stride, m)):
+        j = table.get(key)
+        if j is not None and (i*m + j)*G == beta:
+            return i*m + j
+
+    raise DiscreteLogError('Could not compute discrete log below {}'.format(m*m))
+
+def baby_giant_batch(betas : '[Point]') -> '[int]':
     """
-    import sys
+    The discrete logs of many points at once, i.e. the values x_t satisfying
+    G^x_t = betas[t]. All targets share the baby-step table and are walked
+    together, so each giant step costs a single inversion for all of them
+    (batched affine additions). Raises DiscreteLogError if some x_t is not
+    below the bound given to init_baby_giant
+    """
+    table = baby_giant.table
+    m = table.m
+    stride = table.stride
+    results = [None] * len(betas)
+    gammas = list(betas)
+    active = list(range(len(betas)))
+    for i in range(m):
+        unresolved = []
+        for t in active:
+            j = table.get(x_key(gammas[t]))
+            if j is not None and (i*m + j)*G == betas[t]:
+                results[t] = i*m + j
+            else:
+                unresolved.append(t)
+        active = unresolved
+        if not active:
+            return results
 
-    factor = (-baby_giant.m)*G
-    gamma = beta
-    for i in range(baby_giant.m):
-        if gamma in baby_giant.hashtable.keys():
-            return i*baby_giant.m + baby_giant.hashtable[gamma]
+        for (t, gamma) in zip(active, batchAdd([(gammas[t], stride) for t in active])):
+            gammas[t] = gamma
 
-        gamma -= baby_giant.m*G 
+    raise DiscreteLogError('Could not compute discrete log below {}'.format(m*m))
 
-    # raise exception
-    print('Failure in baby_giant! Could not compute discrete log.')
-    sys.exit(1)
+_baby_giant_lock = threading.Lock()
 
-def init_baby_giant(ulimit : 'int'):
+def init_baby_giant(ulimit : 'int', path : 'str' = None):
     """
     Fill the hashtable for baby_giant. Only values till ulimit are checked in
-    the algorithm
-    """
-    global baby_giant
-    baby_giant.hashtable = dict()
-    baby_giant.m = math.ceil(math.sqrt(ulimit))
-    
-    for j in range(0, baby_giant.m):
-        baby_giant.hashtable[j*G] = j
+    the algorithm. If path is given the table is memory-mapped from that file,
+    which is written first if it does not hold a large enough table. Does
+    nothing if the current table is large enough already
+    """
+    m = math.ceil(math.sqrt(ulimit))
+    # clients in threads of their own may get here at once; the table is
+    # replaced in one assignment, together with its giant step
+    with _baby_giant_lock:
+        current = getattr(baby_giant, 'table', None)
+        if current is not None and current.m >= m:
+            return
+
+        table = None
+        if path is not None and os.path.exists(path):
+            try:
+                table = BabyStepTable.load(path)
+            except ValueError:
+                # rebuilt and saved over below
+                table = None
+            if table is not None and table.m < m:
+                table = None
+        if table is None:
+            table = BabyStepTable.build(m)
+            if path is not None:
+                table.save(path)
+                table = BabyStepTable.load(path)
+        table.stride = -(table.m*G) # giant step
+        baby_giant.table = table
+
+def _kangaroo_params(bound : 'int', kangaroos : 'int') -> '(int, int, int)':
+    """
+    Mean jump, number of jump sizes (powers of two) and distinguished point
+    bits for a total of kangaroos tame and as many wild kangaroos
+    """
+    mean = max(1, kangaroos * int(math.sqrt(bound)) // 2)
+    k = 1
+    while ((1 << k) - 1) // k < mean:
+        k += 1
+    # about sqrt(bound)/(8*kangaroos) steps between distinguished points, so
+    # that reaching the next one after a collision is cheap
+    dp_bits = max(0, (int(math.sqrt(bound)) // (8*kangaroos)).bit_length() - 1)
+    return (mean, k, dp_bits)
+
+def _kangaroo_walk(beta : 'Point', bound : 'int', herd : 'int', kangaroos : 'int', seed):
+    """
+    Walk herd tame kangaroos, started near bound/2 at known logs, and herd wild
+    ones, started at beta plus a known offset, all with the same
+    pseudo-random jumps 2^i*G chosen by the x-coordinate. Generates the
+    distinguished points they reach as (key, tame, distance), where distance is
+    the log of the point for a tame kangaroo and its log minus log(beta) for a
+    wild one, so a tame and a wild kangaroo reaching the same point give
+    log(beta) = tame distance - wild distance. All kangaroos of the herd step
+    together, with a single inversion per step (batched affine additions).
+    Stops after a travel distance of about 8*bound
+    """
+    (mean, k, dp_bits) = _kangaroo_params(bound, kangaroos)
+    dp_mask = (1 << dp_bits) - 1
+    jumps = [(1 << i)*G for i in range(k)]
+    rng = random.Random(seed)
+
+    def start(tame):
+        offset = rng.randrange(mean)
+        if tame:
+            return [(bound // 2 + offset)*G, bound // 2 + offset, True]
+        return [beta + offset*G, offset, False]
+
+    herd = [start(True) for _ in range(herd)] + [start(False) for _ in range(herd)]
+    seen = dict()
+    for _ in range(8*(bound // mean + (1 << dp_bits)) + 64):
+        for kangaroo in herd:
+            key = x_key(kangaroo[0])
+            if key & dp_mask == 0:
+                if seen.get(key) == kangaroo[2]:
+                    # it follows another kangaroo of its kind, start it anew
+                    kangaroo[:] = start(kangaroo[2])
+                    continue
+                seen[key] = kangaroo[2]
+                yield (key, kangaroo[2], kangaroo[1])
+
+        idx = [(x_key(P) >> 32) % k for (P, _, _) in herd]
+        for (kangaroo, i, P) in zip(herd, idx, batchAdd([(herd[j][0], jumps[idx[j]]) for j in range(len(herd))])):
+            kangaroo[0] = P
+            kangaroo[1] += 1 << i
+
+def _kangaroo_worker(beta_xy, bound, herd, kangaroos, seed, reports, stop):
+    beta = I if beta_xy is None else Point(curve, Fq(beta_xy[0]), Fq(beta_xy[1]))
+    try:
+        for dp in _kangaroo_walk(beta, bound, herd, kangaroos, seed):
+            if stop.is_set():
+                break
+            reports.put(dp)
+    finally:
+        reports.put(None)
+
+def kangaroo(beta : 'Point', bound : 'int', processes : 'int' = 1, herd : 'int' = 8, attempts : 'int' = 4) -> 'int':
+    """
+    Pollard's kangaroo (lambda) method for the discrete log x of beta = G^x,
+    with x known to lie in [0, bound). Expected time O(sqrt(bound)) point
+    additions like baby_giant, but the memory is only the distinguished
+    points found. With processes > 1 every process walks its own herd and
+    reports distinguished points to this one. The method is probabilistic:
+    a walk gives up after a travel distance of about 8*bound, and may do so
+    even for x below bound. It is then started again from fresh random
+    points, keeping the distinguished points found so far, up to attempts
+    walks in all. Raises DiscreteLogError if none of them finds the log, which
+    for x below bound is unlikely, not impossible
+    """
+    if beta == I:
+        return 0
+
+    dps = dict()
+    def collide(key, tame, distance):
+        # the log of beta, if this point was reached by both kinds
+        other = dps.setdefault(key, (tame, distance))
+        if other[0] == tame:
+            return None
+        x = (distance - other[1] if tame else other[1] - distance) % order
+        if x < bound and x*G == beta:
+            return x
+        return None
+
+    for _ in range(attempts):
+        x = _kangaroo_search(beta, bound, processes, herd, collide)
+        if x is not None:
+            return x
+    raise DiscreteLogError('Could not compute discrete log below {}'.format(bound))
+
+def _kangaroo_search(beta, bound, processes, herd, collide) -> 'int':
+    # one walk of all herds; the log found by collide, or None
+    kangaroos = herd*processes
+    if processes == 1:
+        for dp in _kangaroo_walk(beta, bound, herd, kangaroos, random.getrandbits(64)):
+            x = collide(*dp)
+            if x is not None:
+                return x
+        return None
+
+    reports = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    beta_xy = (int(beta.x), int(beta.y))
+    workers = [multiprocessing.Process(target=_kangaroo_worker, daemon=True,
+        args=(beta_xy, bound, herd, kangaroos, random.getrandbits(64), reports, stop)) for _ in range(processes)]
+    for w in workers:
+        w.start()
+    try:
+        running = processes
+        while running > 0:
+            dp = reports.get()
+            if dp is None:
+                running -= 1
+                continue
+            x = collide(*dp)
+            if x is not None:
+                return x
+        return None
+    finally:
+        stop.set()
+        for w in workers:
+            w.terminate()
+            w.join()
+
+# above this bound the baby-step table (sqrt(bound) entries) is considered too
+# large, and discrete_log_batch switches to the kangaroo method
+BABY_GIANT_MAX_BOUND = 2**40
+
+def discrete_log_batch(betas : '[Point]', bound : 'int', method : 'str' = 'auto', processes : 'int' = 1) -> '[int]':
+    """
+    The discrete logs of betas, all known to lie in [0, bound). method is
+    'baby_giant', 'kangaroo', or 'auto' for baby_giant up to
+    BABY_GIANT_MAX_BOUND and kangaroo beyond. processes is used by kangaroo,
+    which may raise DiscreteLogError for a log within bound, with a small
+    probability (see kangaroo)
+    """
+    if method == 'auto':
+        method = 'baby_giant' if bound <= BABY_GIANT_MAX_BOUND else 'kangaroo'
+
+    if method == 'baby_giant':
+        init_baby_giant(bound)
+        return baby_giant_batch(betas)
+
+    return [kangaroo(beta, bound, processes) for beta in betas]
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# Parallel verification of batches of proofs. The items of a batch (the
+# arguments of a zkplib batch_verify) are cut into chunks, and the chunks of
+# all batches are verified concurrently by a pool of processes (see
+# workers.py), a sub-batch at a time, each with one randomized batch
+# verification. On the first invalid chunk the chunks that have not started
+# are dropped, and those running stop before their next sub-batch.
+#
+# A VerificationCache remembers the proofs found valid, by a hash of their
+# statement and proof, so that clients sharing it (in a process, or through a
+# file) verify each ledger entry once.
+
+import concurrent.futures
+import hashlib
+import importlib
+import multiprocessing
+import os
+import struct
+import threading
+import workers
+from curveParams import Point, encode
+
+def _verify_chunk(module : 'str', items, stop, size : 'int') -> '(bool, int)':
+    # None if stopped before the end
+    batch_verify = importlib.import_module(module).batch_verify
+    for start in range(0, len(items), size):
+        if stop.is_set():
+            return None
+        (valid, bad) = batch_verify(items[start:start + size])
+        if not valid:
+            return (False, start + bad)
+    return (True, None)
+
+class VerificationEngine(workers.Pool):
+    """
+    A pool of processes verifying batches of proofs, e.g.
+
+        with VerificationEngine(8) as engine:
+            (valid, name, bad) = engine.verify([('dhtuple', 'zkplib.dhTuple', items), ...])
+
+    A chunk is verified sub_batch items at a time, and gives up between
+    sub-batches once another chunk has failed
+    """
+
+    def __init__(self, processes : 'int', chunks_per_process : 'int' = 4, sub_batch : 'int' = 64):
+        super().__init__(processes, chunks_per_process)
+        self.sub_batch = sub_batch
+        # holds the stop flags, which the workers can only get through it
+        self.manager = multiprocessing.Manager()
+
+    def close(self):
+        super().close()
+        self.manager.shutdown()
+
+    def verify(self, batches, cache=None) -> '(bool, str, int)':
+        """
+        batches is a list of (name, module, items), where items are the
+        arguments of module.batch_verify. Returns (True, None, None) if all
+        proofs verify, otherwise (False, name, i) where i is the index of an
+        invalid proof in the items of batch name. Once an invalid proof is
+        found, the chunks that have not started are cancelled, and those that
+        are being verified stop at the end of their current sub-batch. Proofs
+        in the VerificationCache cache are skipped, and valid ones are added
+        to it
+        """
+        if cache is not None:
+            unknown = [cache.unknown(module, items) for (_, module, items) in batches]
+            (valid, name, bad) = self.verify([(name, module, [items[i] for i in positions])
+                for ((name, module, items), (positions, _)) in zip(batches, unknown)])
+            if not valid:
+                names = [name for (name, _, _) in batches]
+                return (False, name, unknown[names.index(name)][0][bad])
+            for (_, digests) in unknown:
+                cache.add(digests)
+            return (True, None, None)
+
+        total = sum([len(items) for (_, _, items) in batches])
+        stop = self.manager.Event()
+        chunks = {}
+        for (name, module, items) in batches:
+            for (start, chunk) in self.chunks(items, total):
+                chunks[self.submit(_verify_chunk, module, chunk, stop, self.sub_batch)] = (name, start)
+
+        for future in concurrent.futures.as_completed(chunks):
+            (valid, bad) = self.result(future)
+            if not valid:
+                stop.set()
+                for other in chunks:
+                    other.cancel()
+                (name, start) = chunks[future]
+                return (False, name, start + bad)
+
+        return (True, None, None)
+
+_length = struct.Struct('>I')
+
+def _absorb(hasher, obj):
+    # a canonical, typed encoding of statements and proofs
+    if isinstance(obj, Point):
+        hasher.update(b'P' + encode(obj).rjust(33, b'\x00'))
+    elif isinstance(obj, int):
+        data = str(obj).encode()
+        hasher.update(b'i' + _length.pack(len(data)) + data)
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        hasher.update(b's' + _length.pack(len(data)) + data)
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(b'l' + _length.pack(len(obj)))
+        for x in obj:
+            _absorb(hasher, x)
+    elif isinstance(obj, dict):
+        hasher.update(b'd' + _length.pack(len(obj)))
+        for k in sorted(obj):
+            _absorb(hasher, k)
+            _absorb(hasher, obj[k])
+    else:
+        raise TypeError('Cannot hash {} for the verification cache'.format(type(obj)))
+
+class VerificationCache(object):
+    """
+    The SHA256 digests of (module, item) for the items of module.batch_verify
+    found valid. Only valid proofs are remembered. With a path, the digests are
+    read from it, and save() appends the new ones
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.valid = set()
+        self.unsaved = []
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.valid = set([data[i:i + 32] for i in range(0, len(data), 32)])
+
+    def __len__(self):
+        return len(self.valid)
+
+    def digest(self, module : 'str', item) -> 'bytes':
+        hasher = hashlib.sha256()
+        _absorb(hasher, module)
+        _absorb(hasher, item)
+        return hasher.digest()
+
+    def unknown(self, module : 'str', items) -> '(list, list)':
+        """
+        The positions in items, and the digests, of the items not known to be
+        valid
+        """
+        positions = []
+        digests = []
+        for (i, item) in enumerate(items):
+            d = self.digest(module, item)
+            if d not in self.valid:
+                positions.append(i)
+                digests.append(d)
+        return (positions, digests)
+
+    def add(self, digests):
+        with self.lock:
+            for d in digests:
+                if d not in self.valid:
+                    self.valid.add(d)
+                    self.unsaved.append(d)
+
+    def batch_verify(self, module : 'str', items) -> '(bool, int)':
+        """
+        module.batch_verify(items), for the items not known to be valid
+        """
+        (positions, digests) = self.unknown(module, items)
+        if positions:
+            (valid, bad) = importlib.import_module(module).batch_verify([items[i] for i in positions])
+            if not valid:
+                return (False, positions[bad])
+            self.add(digests)
+        return (True, None)
+
+    def save(self):
+        with self.lock:
+            if self.path is None or not self.unsaved:
+                return
+            with open(self.path, 'ab') as f:
+                f.write(b''.join(self.unsaved))
+            self.unsaved = []
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# Process pools for the parallel verifier (verification.py) and prover
+# (proving.py). Work is cut into a few chunks per process. Every task carries
+# the curve backend of the client, so that the workers compute on the same
+# curve, whether they were forked or spawned, without a change to the
+# client's environment. Points travel between processes as their compressed
+# encoding, which is the same on every backend.
+
+import concurrent.futures
+import importlib
+import math
+import sys
+import backends
+
+class _Encoded(bytes):
+    """
+    A point in transit
+    """
+    pass
+
+def pack(obj):
+    """
+    obj, with every point (in nested tuples, lists and dicts) replaced by
+    its encoding
+    """
+    # curveParams is imported here, not on import: a spawned worker imports
+    # this module before it knows its backend
+    from curveParams import Point, encode
+    return _pack(obj, Point, encode)
+
+def _pack(obj, Point, encode):
+    if isinstance(obj, Point):
+        return _Encoded(encode(obj))
+    if isinstance(obj, tuple):
+        return tuple([_pack(x, Point, encode) for x in obj])
+    if isinstance(obj, list):
+        return [_pack(x, Point, encode) for x in obj]
+    if isinstance(obj, dict):
+        return dict([(k, _pack(v, Point, encode)) for (k, v) in obj.items()])
+    return obj
+
+def unpack(obj):
+    """
+    The inverse of pack. Equal points are decoded to the same object, so
+    that batch verification merges their terms
+    """
+    from curveParams import G, encode, decode
+    return _unpack(obj, {encode(G): G}, decode)
+
+def _unpack(obj, points, decode):
+    if isinstance(obj, _Encoded):
+        if obj not in points:
+            points[obj] = decode(bytes(obj))
+        return points[obj]
+    if isinstance(obj, tuple):
+        return tuple([_unpack(x, points, decode) for x in obj])
+    if isinstance(obj, list):
+        return [_unpack(x, points, decode) for x in obj]
+    if isinstance(obj, dict):
+        return dict([(k, _unpack(v, points, decode)) for (k, v) in obj.items()])
+    return obj
+
+def _run(backend, module, function, args):
+    # in a worker; one that was spawned has not imported curveParams yet, and
+    # is put on the client's backend first
+    if 'curveParams' not in sys.modules:
+        backends.select(backend)
+    return pack(getattr(importlib.import_module(module), function)(*unpack(args)))
+
+class Pool(object):
+    """
+    A pool of processes on the curve backend of the client, e.g.
+
+        with Pool(8) as pool:
+            futures = [pool.submit(f, chunk) for (start, chunk) in pool.chunks(items)]
+            results = [pool.result(future) for future in futures]
+    """
+
+    def __init__(self, processes : 'int', chunks_per_process : 'int' = 4):
+        self.processes = processes
+        self.chunks_per_process = chunks_per_process
+        self.backend = backends.selected()
+        self.pool = concurrent.futures.ProcessPoolExecutor(processes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def chunks(self, items, total : 'int' = None):
+        """
+        Generate (start, items[start:start + size]) for the chunks of items,
+        of the size that cuts total items (len(items) by default) into
+        chunks_per_process chunks per process
+        """
+        if total is None:
+            total = len(items)
+        size = max(1, int(math.ceil(total / (self.processes * self.chunks_per_process))))
+        for start in range(0, len(items), size):
+            yield (start, items[start:start + size])
+
+    def submit(self, function, *args) -> 'concurrent.futures.Future':
+        """
+        Run function(*args) in a worker; function has to be defined at the top
+        level of a module other than __main__
+        """
+        return self.pool.submit(_run, self.backend, function.__module__, function.__name__, pack(args))
+
+    def result(self, future):
+        """
+        The result of a future returned by submit
+        """
+        return unpack(future.result())
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# Randomized batch verification. Every proof's verification equations are
+# written as a list of (scalar, point) terms that must sum to the identity.
+# All equations of all proofs are scaled by independent random 128-bit weights
+# and summed, so a whole batch is checked with one multi-scalar
+# multiplication; an invalid equation makes the sum vanish only with
+# probability about 2^-128. If the batch fails, it is bisected to find an
+# offending proof.
+
+import logging
+import random
+from curveParams import I, multi_scalar_mul
+
+logger = logging.getLogger('Main.zkp_batch')
+
+# the weights must be unpredictable to the provers
+_rng = random.SystemRandom()
+
+def find_invalid(items) -> 'int or None':
+    """
+    items[i] is the list of equations of the i-th proof, each equation a list
+    of (scalar, Point) terms. Returns the index of a proof with a failing
+    equation, or None if all equations of all proofs hold
+    """
+    return _search(items, 0, len(items))
+
+def _holds(items, start, end) -> 'bool':
+    if end - start == 1 and len(items[start]) == 1:
+        # a single equation needs no weight
+        return multi_scalar_mul(items[start][0]) == I
+
+    # merge terms sharing a base point (G, public keys) into one term
+    scalars = {}
+    points = {}
+    for i in range(start, end):
+        for equation in items[i]:
+            weight = _rng.getrandbits(128)
+            for (k, P) in equation:
+                scalars[id(P)] = scalars.get(id(P), 0) + weight*k
+                points[id(P)] = P
+
+    return multi_scalar_mul([(scalars[key], points[key]) for key in points]) == I
+
+def _search(items, start, end) -> 'int or None':
+    if start == end or _holds(items, start, end):
+        return None
+
+    if end - start == 1:
+        return start
+
+    logger.info("Batch of proofs {}..{} failed, bisecting".format(start, end - 1))
+    mid = (start + end) // 2
+    bad = _search(items, start, mid)
+    if bad is None:
+        bad = _search(items, mid, end)
+
+    return bad
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# Logarithmic size range proof, a drop-in alternative to rangeProof. The
+# structure is the aggregated range proof with the inner product argument of
+# "Bulletproofs: Short Proofs for Confidential Transactions and More" by Bunz
+# et al. (https://eprint.iacr.org/2017/1066, sections 3 and 4.3).
+#
+# Bulletproofs work on Pedersen commitments V = v*G + gamma*H over generators
+# with unknown discrete logs, while our values are ElGamal encrypted under
+# keys whose discrete log the prover may know. So every value gets a Pedersen
+# commitment V, linked to its ciphertext (c1, c2) = (s*G, v*G + s*pk) by a
+# sigma proof of knowledge of (s, gamma) with c1 = s*G and
+# c2 - V = s*pk - gamma*H. The range proof then covers all values of a call at
+# once: its size is logarithmic in the number of bits times values.
+
+import logging
+import sys, os
+import math
+import random
+from curveParams import G, order, q, Fq, curve, Point, multi_scalar_mul
+from Crypto.Hash import SHA256
+from zkplib.batch import find_invalid
+from zkplib.transcript import Transcript
+
+logger = logging.getLogger('Main.zkp_bulletproof')
+
+def _hash_to_point(label : 'str') -> 'Point':
+    """
+    A point with unknown discrete log, by try-and-increment on SHA256
+    """
+    counter = 0
+    while True:
+        seed = '{}:{}'.format(label, counter).encode('utf-8')
+        x = int(SHA256.new(seed).hexdigest(), 16) % q
+        rhs = (x*x*x + 7) % q
+        y = pow(rhs, (q + 1) // 4, q) # q = 3 mod 4
+        if y*y % q == rhs:
+            return Point(curve, Fq(x), Fq(y))
+        counter += 1
+
+# Pedersen blinding generator and inner product generator
+H = _hash_to_point('zorro bulletproof H')
+U = _hash_to_point('zorro bulletproof U')
+
+# vector generators, extended as longer proofs are needed
+_G_vec = []
+_H_vec = []
+
+def _generators(N : 'int') -> '(list, list)':
+    while len(_G_vec) < N:
+        _G_vec.append(_hash_to_point('zorro bulletproof G{}'.format(len(_G_vec))))
+        _H_vec.append(_hash_to_point('zorro bulletproof H{}'.format(len(_H_vec))))
+    return (_G_vec[:N], _H_vec[:N])
+
+def _inv(a : 'int') -> 'int':
+    return pow(a, order - 2, order)
+
+def _inner(a, b) -> 'int':
+    return sum([x*y for (x, y) in zip(a, b)]) % order
+
+def _dimensions(m : 'int', b : 'int') -> '(int, int)':
+    """
+    Bits per value and the padded vector length for m values below bound b
+    """
+    n = max(1, math.ceil(math.log2(b)))
+    N = 1
+    while N < n*m:
+        N *= 2
+    return (n, N)
+
+def _as_lists(args, kwargs, keys) -> '(list, ...)':
+    """
+    A single ciphertext (and its scalar arguments) is a batch of one
+    """
+    aggregated = isinstance(args[0], list)
+    cts = args[0] if aggregated else [args[0]]
+    values = []
+    for key in keys:
+        value = kwargs[key]
+        if aggregated and key == 'pubkey' and not isinstance(value, list):
+            value = [value] * len(cts)
+        values.append(value if aggregated else [value])
+    return [cts] + values
+
+def gen_prf(*args, **kwargs) -> 'dict':
+    """
+    Generate range proof for one ElGamal ciphertext or a list of them
+    Positional args : (c1, c2), or a list of them
+    Keyword args - as rangeProof.gen_prf; message, secret and pubkey are
+    lists for a list of ciphertexts (pubkey may also be one shared key)
+    """
+
+    try:
+        (cts, vs, secrets, pks) = _as_lists(args, kwargs, ['message', 'secret', 'pubkey'])
+        pid = kwargs['pid']
+        b = kwargs['bound']
+    except:
+        exc_type, exc_obj, exc_tb = sys.exc_info()
+        fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
+        print(exc_type, fname, exc_tb.tb_lineno)
+        sys.exit(1)
+
+    logger.info("Generating bulletproof range ZKP for participant id {}".format(pid))
+
+    m = len(cts)
+    (n, N) = _dimensions(m, b)
+    for v in vs:
+        if v < 0 or v >= 2**n:
+            print('Range Proof: input value {} exceeds bound {}'.format(v, b))
+            sys.exit(1)
+    (Gv, Hv) = _generators(N)
+
+    # Pedersen commitments, each linked to its ciphertext
+    gammas = [random.randint(0, order) for _ in range(m)]
+    V = [multi_scalar_mul([(v, G), (gamma, H)]) for (v, gamma) in zip(vs, gammas)]
+    link = []
+    for j in range(m):
+        (c1, c2) = cts[j]
+        k1, k2 = random.randint(0, order), random.randint(0, order)
+        R1 = k1*G
+        R2 = multi_scalar_mul([(k1, pks[j]), (-k2, H)])
+        e = Transcript(pid, j, pks[j], c1, c2, V[j], R1, R2).challenge()
+        link.append({'R1':R1, 'R2':R2, 's1':(k1 + e*secrets[j]) % order, 's2':(k2 + e*gammas[j]) % order})
+
+    # bits of all values, little endian, padded with (a_L, a_R) = (0, -1)
+    a_L = [0] * N
+    for j in range(m):
+        for i in range(n):
+            a_L[j*n + i] = (vs[j] >> i) & 1
+    a_R = [(a - 1) % order for a in a_L]
+
+    alpha, rho = random.randint(0, order), random.randint(0, order)
+    s_L = [random.randint(0, order) for _ in range(N)]
+    s_R = [random.randint(0, order) for _ in range(N)]
+    A = multi_scalar_mul([(alpha, H)] + list(zip(a_L, Gv)) + list(zip(a_R, Hv)))
+    S = multi_scalar_mul([(rho, H)] + list(zip(s_L, Gv)) + list(zip(s_R, Hv)))
+
+    transcript = Transcript(pid, n, V, A, S)
+    y = transcript.challenge()
+    z = transcript.challenge()
+    y_pow = [pow(y, k, order) for k in range(N)]
+    d = _weights(z, n, m, N)
+
+    # l(X) = l0 + l1*X, r(X) = r0 + r1*X, t(X) = <l(X), r(X)>
+    l0 = [(a - z) % order for a in a_L]
+    r0 = [(y_pow[k]*(a_R[k] + z) + d[k]) % order for k in range(N)]
+    r1 = [(y_pow[k]*s_R[k]) % order for k in range(N)]
+    t1 = (_inner(l0, r1) + _inner(s_L, r0)) % order
+    t2 = _inner(s_L, r1)
+
+    tau1, tau2 = random.randint(0, order), random.randint(0, order)
+    T1 = multi_scalar_mul([(t1, G), (tau1, H)])
+    T2 = multi_scalar_mul([(t2, G), (tau2, H)])
+
+    x = transcript.append(T1, T2).challenge()
+    l = [(l0[k] + s_L[k]*x) % order for k in range(N)]
+    r = [(r0[k] + r1[k]*x) % order for k in range(N)]
+    t_hat = _inner(l, r)
+    tau_x = (tau2*x*x + tau1*x + sum([pow(z, 2 + j, order)*gammas[j] for j in range(m)])) % order
+    mu = (alpha + rho*x) % order
+
+    # inner product argument for <l, r> = t_hat over (Gv, y^-k * Hv, w*U)
+    w = transcript.append(tau_x, mu, t_hat).challenge()
+    Uw = w*U
+    y_inv = _inv(y)
+    Gs = Gv
+    Hs = [pow(y_inv, k, order)*Hv[k] for k in range(N)]
+    Ls = []
+    Rs = []
+    while len(l) > 1:
+        h = len(l) // 2
+        cL = _inner(l[:h], r[h:])
+        cR = _inner(l[h:], r[:h])
+        Lj = multi_scalar_mul(list(zip(l[:h], Gs[h:])) + list(zip(r[h:], Hs[:h])) + [(cL, Uw)])
+        Rj = multi_scalar_mul(list(zip(l[h:], Gs[:h])) + list(zip(r[:h], Hs[h:])) + [(cR, Uw)])
+        Ls.append(Lj)
+        Rs.append(Rj)
+        u = transcript.append(Lj, Rj).challenge()
+        u_inv = _inv(u)
+        l = [(l[k]*u + l[h + k]*u_inv) % order for k in range(h)]
+        r = [(r[k]*u_inv + r[h + k]*u) % order for k in range(h)]
+        Gs = [multi_scalar_mul([(u_inv, Gs[k]), (u, Gs[h + k])]) for k in range(h)]
+        Hs = [multi_scalar_mul([(u, Hs[k]), (u_inv, Hs[h + k])]) for k in range(h)]
+
+    return {'V':V, 'link':link, 'A':A, 'S':S, 'T1':T1, 'T2':T2, 'tau_x':tau_x, 'mu':mu,
+            't_hat':t_hat, 'L':Ls, 'R':Rs, 'a':l[0], 'b':r[0]}
+
+def _weights(z : 'int', n : 'int', m : 'int', N : 'int') -> 'list':
+    """
+    d[j*n + i] = z^(2+j) * 2^i, the weight tying bit i to value j; zero on
+    the padding
+    """
+    d = [0] * N
+    for j in range(m):
+        zj = pow(z, 2 + j, order)
+        for i in range(n):
+            d[j*n + i] = (zj << i) % order
+    return d
+
+def equations(*args, **kwargs) -> 'list':
+    """
+    The verification equations of a bulletproof range ZKP, as lists of
+    (scalar, Point) terms that sum to the identity for a valid proof. Returns
+    None if the proof is malformed
+    Positional args : (c1, c2), or a list of them
+    Keyword args - as for verify_prf
+    """
+
+    try:
+        (cts, pks) = _as_lists(args, kwargs, ['pubkey'])
+        pid = kwargs['pid']
+        b = kwargs['bound']
+        V = kwargs['V']
+        link = kwargs['link']
+        A = kwargs['A']
+        S = kwargs['S']
+        T1 = kwargs['T1']
+        T2 = kwargs['T2']
+        tau_x = kwargs['tau_x']
+        mu = kwargs['mu']
+        t_hat = kwargs['t_hat']
+        Ls = kwargs['L']
+        Rs = kwargs['R']
+        a = kwargs['a']
+        b_ = kwargs['b']
+    except:
+        exc_type, exc_obj, exc_tb = sys.exc_info()
+        fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
+        print(exc_type, fname, exc_tb.tb_lineno)
+        sys.exit(1)
+
+    m = len(cts)
+    (n, N) = _dimensions(m, b)
+    if len(V) != m or len(link) != m or len(Ls) != len(Rs) or 2**len(Ls) != N:
+        return None
+    (Gv, Hv) = _generators(N)
+
+    eqs = []
+    # s1*G = R1 + e*c1 and s1*pk - s2*H = R2 + e*(c2 - V)
+    for j in range(m):
+        (c1, c2) = cts[j]
+        lj = link[j]
+        e = Transcript(pid, j, pks[j], c1, c2, V[j], lj['R1'], lj['R2']).challenge()
+        eqs.append([(lj['s1'], G), (-1, lj['R1']), (-e, c1)])
+        eqs.append([(lj['s1'], pks[j]), (-lj['s2'], H), (-1, lj['R2']), (-e, c2), (e, V[j])])
+
+    transcript = Transcript(pid, n, V, A, S)
+    y = transcript.challenge()
+    z = transcript.challenge()
+    x = transcript.append(T1, T2).challenge()
+    w = transcript.append(tau_x, mu, t_hat).challenge()
+    d = _weights(z, n, m, N)
+    y_inv = _inv(y)
+    y_pow = [pow(y, k, order) for k in range(N)]
+    y_inv_pow = [pow(y_inv, k, order) for k in range(N)]
+
+    # t_hat*G + tau_x*H = sum z^(2+j)*V_j + delta*G + x*T1 + x^2*T2
+    delta = ((z - z*z)*sum(y_pow) - z*sum(d)) % order
+    eqs.append([(t_hat - delta, G), (tau_x, H), (-x, T1), (-x*x, T2)] +
+            [(-pow(z, 2 + j, order), V[j]) for j in range(m)])
+
+    # inner product argument, with the folded generators expanded:
+    # s_k is the product of u_j or u_j^-1 by the bits of k
+    us = [transcript.append(Lj, Rj).challenge() for (Lj, Rj) in zip(Ls, Rs)]
+    us_inv = [_inv(u) for u in us]
+    s = [1] * N
+    for k in range(N):
+        for (j, u) in enumerate(us):
+            if (k >> (len(us) - 1 - j)) & 1:
+                s[k] = s[k]*u % order
+            else:
+                s[k] = s[k]*us_inv[j] % order
+
+    # A + x*S - mu*H - z*sum(Gv) + sum((z + d_k*y^-k)*Hv_k) + t_hat*w*U +
+    # sum(u_j^2*L_j + u_j^-2*R_j) = a*sum(s_k*Gv_k) + b*sum(s_k^-1*y^-k*Hv_k) + a*b*w*U
+    terms = [(1, A), (x, S), (-mu, H), (w*(t_hat - a*b_), U)]
+    terms += [(-z - a*s[k], Gv[k]) for k in range(N)]
+    # flipping all bits of k swaps every u_j with u_j^-1, so s_k^-1 = s_(N-1-k)
+    terms += [(z + (d[k] - b_*s[N - 1 - k])*y_inv_pow[k], Hv[k]) for k in range(N)]
+    terms += [(u*u, Lj) for (u, Lj) in zip(us, Ls)]
+    terms += [(ui*ui, Rj) for (ui, Rj) in zip(us_inv, Rs)]
+    eqs.append(terms)
+
+    return eqs
+
+def verify_prf(*args, **kwargs) -> 'bool':
+    """
+    Verification of bulletproof range ZKP
+    Positional args : (c1, c2), or a list of them
+    Keyword args - pid, pubkey (a list, or one shared key, for a list of
+    ciphertexts), bound, and the proof
+    """
+
+    logger.info("Verifying bulletproof range ZKP from participant id {}".format(kwargs.get('pid')))
+
+    eqs = equations(*args, **kwargs)
+    if eqs is None:
+        return False
+
+    return find_invalid([eqs]) is None
+
+def batch_verify(items) -> '(bool, int)':
+    """
+    Verification of many bulletproof range ZKPs with a single randomized
+    multi-scalar multiplication
+    items - list of (ciphertexts, kwargs), the arguments of verify_prf for
+    each proof
+    Returns (True, None) if all proofs verify, otherwise (False, i) where i is
+    the index of an invalid proof
+    """
+
+    logger.info("Batch verifying {} bulletproof range ZKPs".format(len(items)))
+
+    all_equations = []
+    for (i, (c, kwargs)) in enumerate(items):
+        eqs = equations(c, **kwargs)
+        if eqs is None:
+            return (False, i)
+        all_equations.append(eqs)
+
+    bad = find_invalid(all_equations)
+    return (bad is None, bad)
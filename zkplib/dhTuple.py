@@ -6,8 +6,9 @@
 import logging
 import sys, os
 import random
-from curveParams import order
-from Crypto.Hash import SHA256                                    
+from curveParams import order, multi_scalar_mul
+from zkplib.batch import find_invalid
+from zkplib.transcript import Transcript
 
 logger = logging.getLogger('Main.zkp_dhTuple')
 
@@ -33,9 +34,8 @@ def gen_prf(dhtuple, **kwargs) -> 'dict':
     a = r*g
     b = r*h
 
-    # generate crs using SHA256
-    crs = ''.join([str(_) for _ in [pid, a, b]])
-    c = int(SHA256.new(crs.encode('utf-8')).hexdigest(),16) % order
+    # Fiat-Shamir challenge
+    c = Transcript(pid, g, h, u, v, a, b).challenge()
 
     z = r + c*w
     return {'a':a, 'b':b, 'z':z}
@@ -60,16 +60,55 @@ def verify_prf(dhtuple, **kwargs) -> 'bool':
 
     logger.info("Verifying DH 4-tuple ZKP from participant id {}".format(pid))
 
-    # generate crs using SHA256
-    crs = ''.join([str(_) for _ in [pid, a, b]])
-    c = int(SHA256.new(crs.encode('utf-8')).hexdigest(),16) % order
+    # Fiat-Shamir challenge
+    c = Transcript(pid, g, h, u, v, a, b).challenge()
 
-    # check statments
-    if z*g != a + c*u:
+    # check statments, z*g == a + c*u and z*h == b + c*v
+    if multi_scalar_mul([(z, g), (-c, u)]) != a:
         return False
 
-    if z*h != b + c*v:
+    if multi_scalar_mul([(z, h), (-c, v)]) != b:
         return False
 
     # ZKP successful verification
     return True
+
+def equations(dhtuple, **kwargs) -> 'list':
+    """
+    The verification equations of a ZKP of DH 4-tuple, as lists of
+    (scalar, Point) terms that sum to the identity for a valid proof
+    dhtuple - (g, h, u, v)
+    """
+
+    try:
+        (g, h, u, v) = dhtuple
+        pid = kwargs['pid']
+        a = kwargs['a']
+        b = kwargs['b']
+        z = kwargs['z']
+    except:
+        exc_type, exc_obj, exc_tb = sys.exc_info()
+        fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
+        print(exc_type, fname, exc_tb.tb_lineno)
+        sys.exit(1)
+
+    # Fiat-Shamir challenge
+    c = Transcript(pid, g, h, u, v, a, b).challenge()
+
+    # z*g = a + c*u and z*h = b + c*v
+    return [[(z, g), (-1, a), (-c, u)], [(z, h), (-1, b), (-c, v)]]
+
+def batch_verify(items) -> '(bool, int)':
+    """
+    Verification of many ZKPs of DH 4-tuples with a single randomized
+    multi-scalar multiplication
+    items - list of (dhtuple, kwargs), the arguments of verify_prf for each
+    proof
+    Returns (True, None) if all proofs verify, otherwise (False, i) where i is
+    the index of an invalid proof
+    """
+
+    logger.info("Batch verifying {} DH 4-tuple ZKPs".format(len(items)))
+
+    bad = find_invalid([equations(dhtuple, **kwargs) for (dhtuple, kwargs) in items])
+    return (bad is None, bad)
@@ -6,8 +6,9 @@
 import logging
 import sys, os
 import random
-from curveParams import G, order
-from Crypto.Hash import SHA256                                    
+from curveParams import G, order, multi_scalar_mul
+from zkplib.batch import find_invalid
+from zkplib.transcript import Transcript
 
 logger = logging.getLogger('Main.zkp_discretelog')
 
@@ -33,9 +34,8 @@ def gen_prf(*args, **kwargs) -> 'dict':
     v = random.randint(0, order)
     t = v*G
 
-    # generate crs using SHA256
-    crs = ''.join([str(_) for _ in [pid, y, t]])
-    c = int(SHA256.new(crs.encode('utf-8')).hexdigest(),16) % order
+    # Fiat-Shamir challenge
+    c = Transcript(pid, y, t).challenge()
 
     r = v - c*x
     return {'t':t, 'r':r}
@@ -60,13 +60,51 @@ def verify_prf(*args, **kwargs) -> 'bool':
 
     logger.info("Verifying discrete log ZKP from participant id {}".format(pid))
 
-    # generate crs using SHA256
-    crs = ''.join([str(_) for _ in [pid, y, t]])
-    c = int(SHA256.new(crs.encode('utf-8')).hexdigest(),16) % order
+    # Fiat-Shamir challenge
+    c = Transcript(pid, y, t).challenge()
     
     # check statement
-    if t != r*G + c*y:
+    if t != multi_scalar_mul([(r, G), (c, y)]):
         return False
 
     # ZKP successful verification
     return True
+
+def equations(*args, **kwargs) -> 'list':
+    """
+    The verification equations of a ZKP of discrete log, as lists of
+    (scalar, Point) terms that sum to the identity for a valid proof
+    Positional args : y=g^x
+    Keyword args - as for verify_prf
+    """
+
+    try:
+        y = args[0]
+        pid = kwargs['pid']
+        t = kwargs['t']
+        r = kwargs['r']
+    except:
+        exc_type, exc_obj, exc_tb = sys.exc_info()
+        fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
+        print(exc_type, fname, exc_tb.tb_lineno)
+        sys.exit(1)
+
+    # Fiat-Shamir challenge
+    c = Transcript(pid, y, t).challenge()
+
+    # t = r*G + c*y
+    return [[(1, t), (-r, G), (-c, y)]]
+
+def batch_verify(items) -> '(bool, int)':
+    """
+    Verification of many ZKPs of discrete log with a single randomized
+    multi-scalar multiplication
+    items - list of (y, kwargs), the arguments of verify_prf for each proof
+    Returns (True, None) if all proofs verify, otherwise (False, i) where i is
+    the index of an invalid proof
+    """
+
+    logger.info("Batch verifying {} discrete log ZKPs".format(len(items)))
+
+    bad = find_invalid([equations(y, **kwargs) for (y, kwargs) in items])
+    return (bad is None, bad)
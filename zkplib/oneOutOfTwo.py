@@ -6,8 +6,9 @@
 import logging
 import sys, os
 import random
-from curveParams import G, order
-from Crypto.Hash import SHA256                                    
+from curveParams import G, order, multi_scalar_mul
+from zkplib.batch import find_invalid
+from zkplib.transcript import Transcript
 
 logger = logging.getLogger('Main.zkp_oneOutOfTwo')
 
@@ -36,26 +37,25 @@ def gen_prf(*args, **kwargs) -> 'dict':
 
     if v == 1:
         r1, d1 = random.randint(0, order), random.randint(0, order)
-        a1 = r1*G + d1*x
-        b1 = r1*pk + d1*y
+        a1 = multi_scalar_mul([(r1, G), (d1, x)])
+        b1 = multi_scalar_mul([(r1, pk), (d1, y)])
         a2 = w*G
         b2 = w*pk
     else:
         r2, d2 = random.randint(0, order), random.randint(0, order)
         a1 = w*G
         b1 = w*pk
-        a2 = r2*G + d2*x
-        b2 = r2*pk + d2*(y-G)
+        a2 = multi_scalar_mul([(r2, G), (d2, x)])
+        b2 = multi_scalar_mul([(r2, pk), (d2, y), (-d2, G)]) # r2*pk + d2*(y-G)
     
-    # generate crs using SHA256
-    crs = ''.join([str(_) for _ in [pid, x, y, a1, b1, a2, b2]])
-    c = int(SHA256.new(crs.encode('utf-8')).hexdigest(),16) % order
+    # Fiat-Shamir challenge
+    c = Transcript(pid, x, y, a1, b1, a2, b2).challenge()
 
     if v == 1:
-        d2 = c - d1
+        d2 = (c - d1) % order
         r2 = w - secret*d2
     else:
-        d1 = c - d2
+        d1 = (c - d2) % order
         r1 = w - secret*d1
 
     return {'r1':r1, 'r2':r2, 'a1':a1, 'b1':b1, 'a2':a2, 'b2':b2, 'd1':d1, 'd2':d2} 
@@ -88,25 +88,87 @@ def verify_prf(*args, **kwargs) -> 'bool':
     
     logger.info("Verifying one out of two ZKP from participant id {}".format(pid))
 
-    # generate crs using SHA256
-    crs = ''.join([str(_) for _ in [pid, x, y, a1, b1, a2, b2]])
-    c = int(SHA256.new(crs.encode('utf-8')).hexdigest(),16) % order
+    # Fiat-Shamir challenge
+    c = Transcript(pid, x, y, a1, b1, a2, b2).challenge()
 
     # check statements
-    if c != d1 + d2:
+    if c != (d1 + d2) % order:
         return False
 
-    if a1 != r1*G + d1*x:
+    if a1 != multi_scalar_mul([(r1, G), (d1, x)]):
         return False
 
-    if b1 != r1*pk + d1*y:
+    if b1 != multi_scalar_mul([(r1, pk), (d1, y)]):
         return False
 
-    if a2 != r2*G + d2*x:
+    if a2 != multi_scalar_mul([(r2, G), (d2, x)]):
         return False
 
-    if b2 != r2*pk + d2*(y-G):
+    # r2*pk + d2*(y-G)
+    if b2 != multi_scalar_mul([(r2, pk), (d2, y), (-d2, G)]):
         return False
 
     # ZKP successful verification
     return True
+
+def equations(*args, **kwargs) -> 'list':
+    """
+    The verification equations of a ZKP that message \in {0,1}, as lists of
+    (scalar, Point) terms that sum to the identity for a valid proof. Returns
+    None if the proof already fails the check on its challenges
+    Positional args : (c1, c2) - ElGamal encryption of message
+    Keyword args - as for verify_prf
+    """
+
+    try:
+        x = args[0]
+        y = args[1]
+        pid = kwargs['pid']
+        pk = kwargs['pubkey']
+        r1 = kwargs['r1']
+        r2 = kwargs['r2']
+        a1 = kwargs['a1']
+        b1 = kwargs['b1']
+        a2 = kwargs['a2']
+        b2 = kwargs['b2']
+        d1 = kwargs['d1']
+        d2 = kwargs['d2']
+    except:
+        exc_type, exc_obj, exc_tb = sys.exc_info()
+        fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
+        print(exc_type, fname, exc_tb.tb_lineno)
+        sys.exit(1)
+
+    # Fiat-Shamir challenge
+    c = Transcript(pid, x, y, a1, b1, a2, b2).challenge()
+
+    if c != (d1 + d2) % order:
+        return None
+
+    # a1 = r1*G + d1*x, b1 = r1*pk + d1*y, a2 = r2*G + d2*x, b2 = r2*pk + d2*(y-G)
+    return [[(1, a1), (-r1, G), (-d1, x)],
+            [(1, b1), (-r1, pk), (-d1, y)],
+            [(1, a2), (-r2, G), (-d2, x)],
+            [(1, b2), (-r2, pk), (-d2, y), (d2, G)]]
+
+def batch_verify(items) -> '(bool, int)':
+    """
+    Verification of many ZKPs that message \in {0,1} with a single randomized
+    multi-scalar multiplication
+    items - list of ((c1, c2), kwargs), the arguments of verify_prf for each
+    proof
+    Returns (True, None) if all proofs verify, otherwise (False, i) where i is
+    the index of an invalid proof
+    """
+
+    logger.info("Batch verifying {} one out of two ZKPs".format(len(items)))
+
+    all_equations = []
+    for (i, ((c1, c2), kwargs)) in enumerate(items):
+        eqs = equations(c1, c2, **kwargs)
+        if eqs is None:
+            return (False, i)
+        all_equations.append(eqs)
+
+    bad = find_invalid(all_equations)
+    return (bad is None, bad)
@@ -5,9 +5,10 @@ import logging
 import sys, os
 import math
 import random
-from curveParams import G, I, order
+from curveParams import G, order, multi_scalar_mul
 from elgamal import elgamal_encrypt
 from zkplib import oneOutOfTwo as zkp_oneOutOfTwo, dhTuple as zkp_dhTuple                                
+from zkplib.batch import find_invalid
 
 logger = logging.getLogger('Main.zkp_range')
 
@@ -62,11 +63,8 @@ def gen_prf(*args, **kwargs) -> 'dict':
     	vb_prf.append(prf)
 
     # generate dhtuple proof
-    c1sum = I
-    c2sum = I
-    for l in range(L):
-    	c1sum += 2**(L - 1 - l)*vb_enc[l][0]
-    	c2sum += 2**(L - 1 - l)*vb_enc[l][1]
+    c1sum = multi_scalar_mul([(2**(L - 1 - l), vb_enc[l][0]) for l in range(L)])
+    c2sum = multi_scalar_mul([(2**(L - 1 - l), vb_enc[l][1]) for l in range(L)])
     dhtuple = (G, pk, x - c1sum, y - c2sum)
     dhtuple_prf = zkp_dhTuple.gen_prf(dhtuple, pid=pid, secret=secret - rsum)
 
@@ -110,11 +108,8 @@ def verify_prf(*args, **kwargs) -> 'bool':
     		return False
 
     # verify that the sum of bits equal to the encrypted value 
-    c1sum = I
-    c2sum = I
-    for l in range(L):
-    	c1sum += 2**(L - 1 - l)*vb_enc[l][0]
-    	c2sum += 2**(L - 1 - l)*vb_enc[l][1]
+    c1sum = multi_scalar_mul([(2**(L - 1 - l), vb_enc[l][0]) for l in range(L)])
+    c2sum = multi_scalar_mul([(2**(L - 1 - l), vb_enc[l][1]) for l in range(L)])
 
     dhtuple = (G, pk, x - c1sum, y - c2sum)
     if (not zkp_dhTuple.verify_prf(dhtuple, pid = pid, **dhtuple_prf)):
@@ -123,3 +118,66 @@ def verify_prf(*args, **kwargs) -> 'bool':
 
     # ZKP successful verification
     return True
+
+def equations(*args, **kwargs) -> 'list':
+    """
+    The verification equations of a range ZKP (those of every bit's one out
+    of two proof and of the dhtuple proof), as lists of (scalar, Point) terms
+    that sum to the identity for a valid proof. Returns None if the proof
+    fails a check that needs no group operations
+    """
+
+    try:
+        (x,y) = args[0]
+        pid = kwargs['pid']
+        pk = kwargs['pubkey']
+        b = kwargs['bound']
+        vb_prf = kwargs['zkp01']
+        vb_enc = kwargs['encrypted_bits']
+        dhtuple_prf = kwargs['zkp_dhtuple']
+    except:
+        exc_type, exc_obj, exc_tb = sys.exc_info()
+        fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
+        print(exc_type, fname, exc_tb.tb_lineno)
+        sys.exit(1)
+
+    # verify that there are less than b bits
+    L = len(vb_enc)
+    LB = math.ceil(math.log2(b))
+    if (L > LB or len(vb_prf) < L):
+        return None
+
+    eqs = []
+    for l in range(L):
+        (c1, c2) = vb_enc[l]
+        bit_eqs = zkp_oneOutOfTwo.equations(c1, c2, pid = pid, pubkey = pk, **vb_prf[l])
+        if bit_eqs is None:
+            return None
+        eqs += bit_eqs
+
+    c1sum = multi_scalar_mul([(2**(L - 1 - l), vb_enc[l][0]) for l in range(L)])
+    c2sum = multi_scalar_mul([(2**(L - 1 - l), vb_enc[l][1]) for l in range(L)])
+    dhtuple = (G, pk, x - c1sum, y - c2sum)
+    return eqs + zkp_dhTuple.equations(dhtuple, pid = pid, **dhtuple_prf)
+
+def batch_verify(items) -> '(bool, int)':
+    """
+    Verification of many range ZKPs, including all their bit proofs, with a
+    single randomized multi-scalar multiplication
+    items - list of ((c1, c2), kwargs), the arguments of verify_prf for each
+    proof
+    Returns (True, None) if all proofs verify, otherwise (False, i) where i is
+    the index of an invalid proof
+    """
+
+    logger.info("Batch verifying {} range ZKPs".format(len(items)))
+
+    all_equations = []
+    for (i, (c, kwargs)) in enumerate(items):
+        eqs = equations(c, **kwargs)
+        if eqs is None:
+            return (False, i)
+        all_equations.append(eqs)
+
+    bad = find_invalid(all_equations)
+    return (bad is None, bad)
@@ -8,8 +8,8 @@ import logging
 import sys, os
 import random
 from elgamal import elgamal_encrypt
-from curveParams import G, order
-from Crypto.Hash import SHA256                                    
+from curveParams import G, order, multi_scalar_mul
+from zkplib.transcript import Transcript
 
 logger = logging.getLogger('Main.zkp_square')
 
@@ -43,9 +43,8 @@ def gen_prf(*args, **kwargs) -> 'dict':
     (C_b1, C_b2) = elgamal_encrypt(pk, r_b, 0*G)
     (C_b1, C_b2) = (C_b1 + x*A1, C_b2 + x*A2) 
 
-    # generate crs using SHA256
-    crs = ''.join([str(_) for _ in [pid, A1, A2, B1, B2, C_a1, C_a2, C_b1, C_b2]])
-    c = int(SHA256.new(crs.encode('utf-8')).hexdigest(),16) % order
+    # Fiat-Shamir challenge
+    c = Transcript(pid, A1, A2, B1, B2, C_a1, C_a2, C_b1, C_b2).challenge()
 
     # Canny, step3
     v = (c*a + x) % order
@@ -79,25 +78,22 @@ def verify_prf(*args, **kwargs) -> 'bool':
     
     logger.info("Verifying ZKP for square relation for participant id {}".format(pid))
 
-    # generate crs using SHA256
-    crs = ''.join([str(_) for _ in [pid, A1, A2, B1, B2, C_a1, C_a2, C_b1, C_b2]])
-    c = int(SHA256.new(crs.encode('utf-8')).hexdigest(),16) % order
+    # Fiat-Shamir challenge
+    c = Transcript(pid, A1, A2, B1, B2, C_a1, C_a2, C_b1, C_b2).challenge()
      
-    # Canny, step4
-    (e1, e2) = elgamal_encrypt(pk, z_a, v*G)
-    (f1, f2) = elgamal_encrypt(pk, z_b, 0*G)
-
-    # check statements
-    if e1 !=  c*A1 + C_a1:
+    # Canny, step4: with (e1, e2) = E(v; z_a) and (f1, f2) = E(0; z_b), check
+    # e1 = c*A1 + C_a1, e2 = c*A2 + C_a2, f1 + v*A1 = c*B1 + C_b1 and
+    # f2 + v*A2 = c*B2 + C_b2
+    if multi_scalar_mul([(z_a, G), (-c, A1)]) != C_a1:
         return False
 
-    if e2 != c*A2 + C_a2:
+    if multi_scalar_mul([(z_a, pk), (v, G), (-c, A2)]) != C_a2:
         return False
 
-    if f1 + v*A1 != c*B1 + C_b1:
+    if multi_scalar_mul([(z_b, G), (v, A1), (-c, B1)]) != C_b1:
         return False
 
-    if f2 + v*A2 != c*B2 + C_b2:
+    if multi_scalar_mul([(z_b, pk), (v, A2), (-c, B2)]) != C_b2:
         return False
 
     # ZKP successful verification
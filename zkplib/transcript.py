@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# Fiat-Shamir transcripts. Everything a challenge depends on is absorbed into
+# a running SHA256 in a canonical binary form: points as their 33 byte SEC1
+# compressed encoding, ints as 32 byte big-endian scalars mod order, strings
+# (participant ids) and lists with a length prefix. The encoding is the same
+# on every curve backend, and avoids printing big ints in decimal.
+
+import struct
+from curveParams import order, encode
+from Crypto.Hash import SHA256
+
+_length = struct.Struct('>I')
+
+class Transcript(object):
+    """
+    Transcript(pid, y, t).challenge() hashes pid, y and t into a challenge.
+    More items can be appended after a challenge, and later challenges depend
+    on all items and challenges before them
+    """
+
+    def __init__(self, *items):
+        self.hash = SHA256.new()
+        self.append(*items)
+
+    def append(self, *items) -> 'Transcript':
+        for item in items:
+            if isinstance(item, int):
+                self.hash.update((item % order).to_bytes(32, 'big'))
+            elif isinstance(item, str):
+                data = item.encode('utf-8')
+                self.hash.update(_length.pack(len(data)) + data)
+            elif isinstance(item, (list, tuple)):
+                self.hash.update(_length.pack(len(item)))
+                self.append(*item)
+            else:
+                # the ideal encodes as a single byte, keep points fixed width
+                self.hash.update(encode(item).rjust(33, b'\x00'))
+        return self
+
+    def challenge(self) -> 'int':
+        """
+        A challenge mod order, which is absorbed in turn
+        """
+        c = int.from_bytes(self.hash.copy().digest(), 'big') % order
+        self.append(c)
+        return c
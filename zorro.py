@@ -9,13 +9,17 @@
 import random
 import math
 from ledger import Ledger
-from curveParams import G, I, order
+from curveParams import G, I, order, batchNormalize
 from elgamal import elgamal_encrypt, elgamal_decrypt
-from utils import init_baby_giant, baby_giant
-from zkplib import discretelog as zkp_discretelog, dhTuple as zkp_dhTuple, oneOutOfTwo as zkp_oneOutOfTwo, square as zkp_square, rangeProof as zkp_range
+from utils import discrete_log_batch
+from verification import VerificationEngine
+from proving import ProverPool, prove_coordinate
+from zkplib import discretelog as zkp_discretelog, dhTuple as zkp_dhTuple, oneOutOfTwo as zkp_oneOutOfTwo, square as zkp_square, rangeProof as zkp_range, bulletproof as zkp_bulletproof
 
 class Zorro(object):
-    def __init__(self, ledger, uid, length, gmax, total_bound):
+    # range_proof: 'bits' for a one out of two proof per bit of every value,
+    # 'bulletproof' for one logarithmic size proof over all values
+    def __init__(self, ledger, uid, length, gmax, total_bound, range_proof='bits'):
         self.ledger = ledger
         self.uid = uid
         self.priv_key = random.randint(0,order)
@@ -24,6 +28,23 @@ class Zorro(object):
         self.bound = total_bound
         self.lmax = math.ceil(math.log2(total_bound))
         self.len = length
+        self.range_proof = range_proof
+        self.zkp_range = zkp_bulletproof if range_proof == 'bulletproof' else zkp_range
+        # decoding of the aggregate, see utils.discrete_log_batch
+        self.dlog_method = 'auto'
+        self.dlog_processes = 1
+        # with more than one process, results() verifies the proofs of the
+        # proof phase in parallel, see verification.py
+        self.verify_processes = 1
+        # with more than one process, prove() generates the proofs of the
+        # values in parallel, see proving.py
+        self.prove_processes = 1
+        # a verification.VerificationCache, possibly shared with other
+        # clients, of the proofs already found valid
+        self.verification_cache = None
+        # the index of the first value, in chunked mode (see streaming.py)
+        # where the vector goes through the ledger a block at a time
+        self.offset = 0
 
     # Step 1: commit initial input to the ledger
     def commit(self, g):
@@ -44,13 +65,14 @@ class Zorro(object):
         for x in range(self.len):
             pk = self.secrets[x]*G
             self.pk_list.append(pk)
-            zkp_discretelog_list.append(zkp_discretelog.gen_prf(self.secrets[x], pk, pid=str(self.uid) + ":" + str(x)))
+            zkp_discretelog_list.append(zkp_discretelog.gen_prf(self.secrets[x], pk, pid=self.pid(self.uid, x)))
 
         if (self.ledger.commit_zkp_discretelog(self.pk_list, zkp_discretelog_list, self.uid) == 0):
             print("Commit failed for {}".format(self.uid))
 
-    # Step 2: generate proofs for the inputs
-    def prove(self):
+    # Step 2: generate proofs for the inputs; in chunked mode (cumulative)
+    # the sum range proof is of the sum of the values of all blocks so far
+    def prove(self, cumulative=False):
         if (self.ledger.cur_phase != 'p'):
             print("Not in proof phase!")
             return
@@ -60,41 +82,34 @@ class Zorro(object):
             print("ZKP discrete log validation failed!")
             return
 
-        # compute the encryption of g (equation 2), which cancels after addition; generate range proof for each value of g
-        encrypted_g1 = []
-        h_list = []
-        zkp_range_g1 = []
-        for x in range(self.len):
-            h = I
-            for u in self.ledger.pk_list:
-                if (u < self.uid):
-                    h += self.ledger.pk_list[u][x]
-                elif (u > self.uid):
-                    h -= self.ledger.pk_list[u][x]
-            h_list.append(h)
-            c = elgamal_encrypt(h, self.secrets[x], self.g[x]*G)
-            encrypted_g1.append(c)
-            prf = zkp_range.gen_prf(c, pid=str(self.uid) + ":" + str(x), message=self.g[x], secret=self.secrets[x], 
-                    pubkey=h_list[x], bound=self.gmax)
-            zkp_range_g1.append(prf)
+        # compute the encryption of g (equation 2), which cancels after addition
+        # h = sum of the keys below uid - sum of the keys above uid
+        (below, through, total) = self.ledger.pk_prefix(self.uid)
+        h_list = batchNormalize([below[x].toJacobian() - total[x] + through[x] for x in range(self.len)])
+
+        # for each value of g: its encryption, a range proof, another
+        # encryption which uses the same public key for all values, and a zkp
+        # for dhtuple (equation 3)
+        coordinates = [(self.pid(self.uid, x), self.g[x], self.secrets[x], h_list[x], self.h, self.gmax,
+            self.range_proof == 'bits') for x in range(self.len)]
+        if (self.prove_processes > 1):
+            with ProverPool(self.prove_processes) as pool:
+                proofs = pool.prove(coordinates)
+        else:
+            proofs = [prove_coordinate(*args) for args in coordinates]
+        (encrypted_g1, zkp_range_g1, encrypted_g2, zkp_dhtuple_list) = [list(p) for p in zip(*proofs)]
+
+        if (self.range_proof == 'bulletproof'):
+            zkp_range_g1 = zkp_bulletproof.gen_prf(encrypted_g1, pid=str(self.uid), message=self.g, secret=self.secrets,
+                    pubkey=h_list, bound=self.gmax)
         if (self.ledger.commit_zkp_range(zkp_range_g1, self.uid) == 0):
             print("Failed to upload ZKP of range proof for {}!".format(self.uid))
             return
 
-        # compute another encryption of g, which uses the same public key for all values; generate zkp for dhtuple (equation 3)
-        encrypted_g2 = []
-        zkp_dhtuple_list = []
-        for x in range(self.len):
-            encrypted_g2.append(elgamal_encrypt(self.h, self.secrets[x], self.g[x]*G))
-            dhtuple = (G, h_list[x] - self.h, self.secrets[x]*G, encrypted_g1[x][1] - encrypted_g2[x][1])
-            prf = zkp_dhTuple.gen_prf(dhtuple, pid=str(self.uid) + ":" + str(x), secret=self.secrets[x])
-            zkp_dhtuple_list.append(prf)
-
         if (self.ledger.commit_zkp_dhtuple(self.h, h_list, encrypted_g1, encrypted_g2, zkp_dhtuple_list, self.uid) == 0):
             print("Failed to upload ZKP of dhtuple for {}!".format(self.uid))
             return
 
-
         # generate range proof for sum
         g_sum = 0
         g_encsum1 = I
@@ -105,82 +120,184 @@ class Zorro(object):
             g_encsum1 += encrypted_g2[x][0]
             g_encsum2 += encrypted_g2[x][1]
             g_secsum += self.secrets[x]
+        if (cumulative):
+            (v, s, c1, c2) = self.total
+            self.total = (v + g_sum, s + g_secsum, c1 + g_encsum1, c2 + g_encsum2)
+            (g_sum, g_secsum, g_encsum1, g_encsum2) = self.total
         g_encsum = (g_encsum1, g_encsum2)
-        zkp_sumRange = zkp_range.gen_prf(g_encsum, pid=str(self.uid), message=g_sum, secret=g_secsum, pubkey=self.h, bound=self.bound)
+        zkp_sumRange = self.zkp_range.gen_prf(g_encsum, pid=str(self.uid), message=g_sum, secret=g_secsum, pubkey=self.h, bound=self.bound)
         if (self.ledger.commit_zkp_sumRange(zkp_sumRange, self.uid) == 0):
             print("Failed to upload ZKP of sum range for {}!".format(self.uid))
             return
 
+    def pid(self, u, x) -> 'str':
+        # the participant id in the proofs of value x
+        return str(u) + ":" + str(self.offset + x)
+
+    def batch_verify(self, zkp, items) -> '(bool, int)':
+        # zkp.batch_verify, skipping the proofs in the verification cache
+        if (self.verification_cache is None):
+            return zkp.batch_verify(items)
+        return self.verification_cache.batch_verify(zkp.__name__, items)
+
     def check_zkp_discretelog(self, all_pk_list, all_zkp_discretelog) -> 'bool':
         print("Checking ZKP discrete log by {}".format(self.uid))
         assert len(all_pk_list) == len(all_zkp_discretelog)
+        index = []
+        items = []
         for u in all_pk_list:
             for x in range(self.len):
-                if (not zkp_discretelog.verify_prf(all_pk_list[u][x], pid=str(u) + ":" + str(x), **all_zkp_discretelog[u][x])):
-                    return False
+                index.append((u, x))
+                items.append((all_pk_list[u][x], dict(pid=self.pid(u, x), **all_zkp_discretelog[u][x])))
+        (valid, bad) = self.batch_verify(zkp_discretelog, items)
+        if (not valid):
+            print("zkp discrete log validation failed for u = {}, x={}".format(str(index[bad][0]), str(index[bad][1])))
+            return False
         return True
 
-    # Step 3: get results
-    def results(self):
-        assert self.check_zkp_dhtuple(self.ledger.h, self.ledger.pk_list, self.ledger.h_list, self.ledger.encrypted_g1, 
-            self.ledger.encrypted_g2, self.ledger.zkp_dhtuple_dict), "ZKP dhtuple validation failed!"
-        assert self.check_zkp_range(self.ledger.encrypted_g1, self.ledger.h_list, self.ledger.zkp_range_dict), "ZKP range validation failed!"
-        assert self.check_zkp_sumRange(self.ledger.encrypted_g2, self.ledger.h, self.ledger.zkp_sumRange_dict), "ZKP sum range validation failed!"
-        init_baby_giant(100)
-        return self.aggregate(self.ledger.encrypted_g1)
+    # Step 3: get results; in chunked mode (cumulative) the sum range proofs
+    # are of the sums of the values of all blocks so far
+    def results(self, cumulative=False):
+        previous = self.encrypted_sums if cumulative else None
+        if (self.verify_processes > 1):
+            assert self.check_zkps_parallel(previous), "ZKP validation failed!"
+        else:
+            assert self.check_zkp_dhtuple(self.ledger.h, self.ledger.pk_list, self.ledger.h_list, self.ledger.encrypted_g1, 
+                self.ledger.encrypted_g2, self.ledger.zkp_dhtuple_dict), "ZKP dhtuple validation failed!"
+            assert self.check_zkp_range(self.ledger.encrypted_g1, self.ledger.h_list, self.ledger.zkp_range_dict), "ZKP range validation failed!"
+            assert self.check_zkp_sumRange(self.ledger.encrypted_g2, self.ledger.h, self.ledger.zkp_sumRange_dict,
+                previous), "ZKP sum range validation failed!"
+        if (cumulative):
+            self.encrypted_sums = self.encrypted_sums_of(self.ledger.encrypted_g2, self.ledger.h, previous)
+        # every value is proven to be below 2^ceil(log2(gmax))
+        bound = len(self.ledger.encrypted_g1) * 2**math.ceil(math.log2(self.gmax))
+        return self.aggregate(self.ledger.encrypted_g1, bound)
+
+    def check_zkps_parallel(self, previous=None) -> 'bool':
+        # the three checks below, with all their proofs verified by a pool of
+        # self.verify_processes processes
+        print("Checking ZKPs by {} in {} processes".format(self.uid, self.verify_processes))
+        (dhtuple_index, dhtuple_items) = self.zkp_dhtuple_items(self.ledger.h, self.ledger.pk_list, self.ledger.h_list,
+            self.ledger.encrypted_g1, self.ledger.encrypted_g2, self.ledger.zkp_dhtuple_dict)
+        (range_index, range_items) = self.zkp_range_items(self.ledger.encrypted_g1, self.ledger.h_list, self.ledger.zkp_range_dict)
+        (sum_index, sum_items) = self.zkp_sumRange_items(self.ledger.encrypted_g2, self.ledger.h, self.ledger.zkp_sumRange_dict, previous)
+        batches = [('dhtuple', zkp_dhTuple.__name__, dhtuple_items), ('range', self.zkp_range.__name__, range_items),
+            ('sum range', self.zkp_range.__name__, sum_items)]
+        index = {'dhtuple': dhtuple_index, 'range': range_index, 'sum range': sum_index}
+        with VerificationEngine(self.verify_processes) as engine:
+            (valid, name, bad) = engine.verify(batches, self.verification_cache)
+        if (not valid):
+            print("zkp {} validation failed for u = {}, x={}".format(name, str(index[name][bad][0]), str(index[name][bad][1])))
+            return False
+        return True
 
     def check_zkp_dhtuple(self, all_h, all_pk_list, all_h_list, all_encrypted_g1, all_encrypted_g2, all_zkp_dhtuple) -> 'bool':
         print("Checking ZKP dhtuple by {}".format(self.uid))
+        (index, items) = self.zkp_dhtuple_items(all_h, all_pk_list, all_h_list, all_encrypted_g1, all_encrypted_g2, all_zkp_dhtuple)
+        (valid, bad) = self.batch_verify(zkp_dhTuple, items)
+        if (not valid):
+            print("zkp dhtuple validation failed for u = {}, x={}".format(str(index[bad][0]),str(index[bad][1])))
+            return False
+        return True
+
+    def zkp_dhtuple_items(self, all_h, all_pk_list, all_h_list, all_encrypted_g1, all_encrypted_g2, all_zkp_dhtuple):
+        # the (u, x) of every proof, and the arguments of zkp_dhTuple.batch_verify
         ucount = len(all_h)
         assert len(all_h_list) == ucount
         assert len(all_encrypted_g1) == ucount
         assert len(all_encrypted_g2) == ucount
         assert len(all_zkp_dhtuple) == ucount
+        index = []
+        items = []
         for u in all_h:
-            print("user {}".format(str(u)))
             for x in range(self.len):
                 dhtuple = (G, all_h_list[u][x] - all_h[u], all_pk_list[u][x], all_encrypted_g1[u][x][1] - all_encrypted_g2[u][x][1])
-                if (not zkp_dhTuple.verify_prf(dhtuple, pid=str(u) + ":" + str(x), **all_zkp_dhtuple[u][x])):
-                    print("zkp dhtuple validation failed for u = {}, x={}".format(str(u),str(x)))
-                    return False
-        return True
+                index.append((u, x))
+                items.append((dhtuple, dict(pid=self.pid(u, x), **all_zkp_dhtuple[u][x])))
+        return (index, items)
 
     def check_zkp_range(self, all_encrypted_g1, all_h_list, all_zkp_range) -> 'bool':
         print("Checking ZKP range by {}".format(self.uid))
+        (index, items) = self.zkp_range_items(all_encrypted_g1, all_h_list, all_zkp_range)
+        (valid, bad) = self.batch_verify(self.zkp_range, items)
+        if (not valid):
+            print("zkp range validation failed for u = {}, x={}".format(str(index[bad][0]), str(index[bad][1])))
+            return False
+        return True
+
+    def zkp_range_items(self, all_encrypted_g1, all_h_list, all_zkp_range):
         ucount = len(all_encrypted_g1)
         assert len(all_h_list) == ucount
         assert len(all_zkp_range) == ucount
+        index = []
+        items = []
         for u in all_encrypted_g1:
-            print("user {}".format(str(u)))
+            if (self.range_proof == 'bulletproof'):
+                index.append((u, 'all'))
+                items.append((list(all_encrypted_g1[u]), dict(pubkey=list(all_h_list[u]), pid=str(u), bound=self.gmax, **all_zkp_range[u])))
+                continue
             for x in range(self.len):
-                if (not zkp_range.verify_prf(all_encrypted_g1[u][x], pubkey=all_h_list[u][x],pid=str(u) + ":" + str(x), bound=self.gmax, **all_zkp_range[u][x])):
-                    print("zkp range validation failed for u = {}, x={}".format(str(u), str(x)))
-                    return False
-        return True
+                index.append((u, x))
+                items.append((all_encrypted_g1[u][x], dict(pubkey=all_h_list[u][x], pid=self.pid(u, x), bound=self.gmax, **all_zkp_range[u][x])))
+        return (index, items)
 
-    def check_zkp_sumRange(self, all_encrypted_g2, all_h, all_zkp_sumRange) -> 'bool':
+    def check_zkp_sumRange(self, all_encrypted_g2, all_h, all_zkp_sumRange, previous=None) -> 'bool':
         print("Checking ZKP sum range by {}".format(self.uid))
+        (index, items) = self.zkp_sumRange_items(all_encrypted_g2, all_h, all_zkp_sumRange, previous)
+        (valid, bad) = self.batch_verify(self.zkp_range, items)
+        if (not valid):
+            print("zkp sum range validation failed for u = {}".format(str(index[bad][0])))
+            return False
+        return True
+
+    def zkp_sumRange_items(self, all_encrypted_g2, all_h, all_zkp_sumRange, previous=None):
         ucount = len(all_encrypted_g2)
         assert len(all_h) == ucount
         assert len(all_zkp_sumRange) == ucount
+        sums = self.encrypted_sums_of(all_encrypted_g2, all_h, previous)
+        index = []
+        items = []
+        for u in sums:
+            (h, gsum1, gsum2) = sums[u]
+            gsum = (gsum1, gsum2)
+            index.append((u, 'sum'))
+            items.append((gsum, dict(pid=str(u),pubkey=h,bound=self.bound,**all_zkp_sumRange[u])))
+        return (index, items)
+
+    def encrypted_sums_of(self, all_encrypted_g2, all_h, previous=None):
+        # the sum of encrypted_g2 of every user, with its key, added to the
+        # sums of the blocks before in chunked mode (previous)
+        sums = {}
         for u in all_encrypted_g2:
-            print("user {}".format(str(u)))
-            gsum1 = I
-            gsum2 = I
+            (h, gsum1, gsum2) = (all_h[u], I, I)
+            if (previous is not None and u in previous):
+                (h, gsum1, gsum2) = previous[u]
+                assert h == all_h[u], "{} changed its key".format(u)
             for x in range(self.len):
                 gsum1 += all_encrypted_g2[u][x][0]
                 gsum2 += all_encrypted_g2[u][x][1]
-            gsum = (gsum1, gsum2)
-            if (not zkp_range.verify_prf(gsum, pid=str(u),pubkey=all_h[u],bound=self.bound,**all_zkp_sumRange[u])):
-                print("zkp sum range validation failed for u = {}".format(str(u)))
-                return False
-        return True
+            sums[u] = (h, gsum1, gsum2)
+        return sums
 
-    def aggregate(self, all_encrypted_g1):
-        result = []
+    def aggregate(self, all_encrypted_g1, bound):
+        sums = []
         for x in range(self.len):
             sumG = I
             for u in all_encrypted_g1:
                 sumG += all_encrypted_g1[u][x][1]
-            result.append(baby_giant(sumG))
-        return result
+            sums.append(sumG)
+        return discrete_log_batch(sums, bound, self.dlog_method, self.dlog_processes)
+
+    # Chunked mode: instead of commit, prove and results, for every block of
+    # the vector commit_block, prove(cumulative=True) and
+    # results(cumulative=True), in a round of the ledger each
+    def commit_block(self, g, offset):
+        if (offset == 0):
+            # the sums of the values, secrets and encrypted_g2 of the blocks
+            # so far, and the same sums of encrypted_g2 of every user with
+            # its key
+            self.total = (0, 0, I, I)
+            self.encrypted_sums = {}
+        self.offset = offset
+        self.len = len(g)
+        self.commit(g)